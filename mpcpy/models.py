@@ -42,16 +42,24 @@ Classes
 =======
 
 .. autoclass:: mpcpy.models.Occupancy
-    :members: estimate, validate, simulate, get_load, get_constraint, 
+    :members: estimate, update, validate, simulate, get_load, get_constraint, 
               get_estimate_options, set_occupancy_method, get_simulate_options,
               set_estimate_options, set_simulate_options, display_measurements, 
               get_base_measurements
 
+.. autoclass:: mpcpy.models.OccupancyPortfolio
+    :members: estimate, simulate, get_model, get_estimate_options, 
+              get_simulate_options, set_estimate_options, set_simulate_options
+
 Occupancy Methods
 =================
 
 .. autoclass:: mpcpy.models.QueueModel
 
+.. autoclass:: mpcpy.models.QueueModelPELT
+
+.. autoclass:: mpcpy.models.MarkovModel
+
 """
 
 from abc import ABCMeta, abstractmethod
@@ -60,17 +68,20 @@ from matplotlib import pyplot as plt
 import pandas as pd
 import csv
 import logging
+import multiprocessing
 import pdb
 from datetime import timedelta
 from mpcpy import units
 from mpcpy import variables
 from mpcpy import utility
 from mpcpy import optimization
-from occupant.occupancy.queueing.adaptive_breakpoint_placement import adaptive_breakpoint_placement
-from occupant.occupancy.queueing.simulate_queue import simulate_queue
-from occupant.occupancy.queueing.unique_last import unique_last
-from occupant.occupancy.queueing.interp1 import interp1
-from occupant.occupancy.queueing.parameter_inference_given_segments import parameter_inference_given_segment
+from occupant.occupancy.queueing.adaptive_breakpoint_placement import coarse_to_fine_breakpoint_placement
+from occupant.occupancy.queueing.optimal_breakpoint_placement import optimal_breakpoint_placement
+from occupant.occupancy.queueing.simulate_queue import simulate_queue_statistics
+from occupant.occupancy.queueing.occupancy_moments import occupancy_moments, occupancy_quantiles
+from occupant.occupancy.queueing.parameter_inference_given_segments import parameter_inference_given_segments
+from occupant.occupancy.queueing.random_streams import random_stream
+from occupant.occupancy.markov.markov_chain import transition_counts, transition_matrices, propagate_distribution, simulate_markov_chain_batch, empirical_distribution, distribution_statistics
 from estimationpy.fmu_utils import model as ukf_model
 from estimationpy.ukf.ukf_fmu import UkfFmu
 from estimationpy.fmu_utils import estimationpy_logging
@@ -406,6 +417,37 @@ class Occupancy(_Model):
             self.set_estimate_options(kwargs['estimate_options']);
         # Perform estimation
         self._occupancy_method._estimate(self);
+
+    def update(self, start_time, final_time):
+        '''Update the estimated parameters of the model with new measurement 
+        data.
+
+        The parameters are updated from running statistics of the data of 
+        previous estimations and updates, so that only the data of the 
+        update period is processed.  The structure of the model, such as 
+        the breakpoints of a ``QueueModel``, is kept from the last 
+        estimation.  Use the ``estimate`` method to estimate it again.
+
+        Parameters
+        ----------
+        start_time : string
+            Start time of update period.  Should not overlap with data 
+            already used for estimation or update.
+        final_time : string
+            Final time of update period.
+
+        Yields
+        ------
+        parameter_data : dictionary
+            Updates the ``'Value'`` key for each estimated parameter in the 
+            parameter_data attribute.
+
+        '''
+
+        # Set the update time interval
+        self._set_time_interval(start_time, final_time);
+        # Perform update
+        self._occupancy_method._update(self);
         
     def validate(self, start_time, final_time, validate_filename, plot = 1):
         '''Validate the estimated parameters of the model with measurement data.
@@ -460,8 +502,9 @@ class Occupancy(_Model):
         measurements : dictionary
             Updates the ``'Simulated'`` key for each measurement in the 
             measurements attribute.  If available by the occupancy method, 
-            also updates the ``'SimulatedError'`` key for each measurement in
-            the measurements attribute.
+            also updates the ``'SimulatedError'`` key and the 
+            ``'SimulatedQuantile'`` keys of the requested quantiles for each 
+            measurement in the measurements attribute.
 
         '''
         
@@ -488,12 +531,18 @@ class Occupancy(_Model):
 
         '''
 
-        # Get occupancy prediction
-        ts = self.measurements[self._occupancy_method.occ_key]['Simulated'].get_base_data();
-        # Multiply by load factor
-        ts_load = load_per_person*ts;
+        # Get the memo of the current occupancy prediction
+        cache = self._get_prediction_cache();
+        try:
+            memoized = load_per_person in cache['load'];
+        except TypeError:
+            # Factors that cannot be keys, e.g. arrays, are not memoized
+            return load_per_person*cache['prediction'];
+        if not memoized:
+            # Multiply occupancy prediction by load factor
+            cache['load'][load_per_person] = load_per_person*cache['prediction'];
         # Return timeseries
-        return ts_load;
+        return cache['load'][load_per_person];
         
     def get_constraint(self, occupied_value, unoccupied_value):
         '''Get a constraint timeseries based on the predicted occupancy.
@@ -512,14 +561,61 @@ class Occupancy(_Model):
 
         '''
 
-        # Get occupancy prediction
-        ts = self.measurements[self._occupancy_method.occ_key]['Simulated'].get_base_data();
-        # Determine when occupied
-        ts_occ = ts>=0.5;
-        # Apply occupied and unoccupied values
-        ts_occ_value = ts_occ.apply(lambda x: occupied_value if x == 1 else unoccupied_value);
+        # Get the memo of the current occupancy prediction
+        cache = self._get_prediction_cache();
+        key = (occupied_value, unoccupied_value);
+        try:
+            memoized = key in cache['constraint'];
+        except TypeError:
+            # Values that cannot be keys, e.g. arrays, are not memoized
+            memoized = None;
+        if not memoized:
+            # Determine when occupied
+            if 'occupied' not in cache:
+                cache['occupied'] = cache['prediction'].values>=0.5;
+            # Apply occupied and unoccupied values
+            constraint = pd.Series(np.where(cache['occupied'], occupied_value, unoccupied_value), index = cache['prediction'].index);
+            if memoized is None:
+                return constraint;
+            cache['constraint'][key] = constraint;
         # Return timeseries
-        return ts_occ_value;
+        return cache['constraint'][key];
+
+    def _get_prediction_cache(self):
+        '''Get the memo of the loads and constraints of the current occupancy 
+        prediction.
+
+        The memo is keyed on the ``'Simulated'`` variable of the 
+        measurements, so that it is cleared when the model is simulated 
+        again.  The timeseries it holds are shared by the callers of 
+        ``get_load`` and ``get_constraint`` and should not be modified.
+
+        Returns
+        -------
+        cache : dictionary
+            Memo with the ``'prediction'`` timeseries and the ``'load'`` and 
+            ``'constraint'`` timeseries already computed.
+
+        '''
+
+        simulated = self.measurements[self._occupancy_method.occ_key]['Simulated'];
+        cache = getattr(self, '_prediction_cache', None);
+        if cache is None or cache['simulated'] is not simulated:
+            cache = {'simulated' : simulated, 'prediction' : simulated.get_base_data(), 'load' : {}, 'constraint' : {}};
+            self._prediction_cache = cache;
+
+        return cache;
+
+    def __getstate__(self):
+        '''Return the state of the model for pickling, without the memo of 
+        the loads and constraints of the current occupancy prediction.
+
+        '''
+
+        state = dict(self.__dict__);
+        state.pop('_prediction_cache', None);
+
+        return state;
 
     def set_occupancy_method(self, occupancy_method):
         '''Set the occupancy method for the model.
@@ -587,6 +683,207 @@ class Occupancy(_Model):
         return self._occupancy_method.estimate_options;
         
         
+class OccupancyPortfolio(utility._mpcpyPandas):
+    '''Class for a portfolio of occupancy models of many spaces.
+
+    The occupancy models of all spaces use the same occupancy method and 
+    options.  Estimation reshapes the training data of all spaces measured 
+    with the same sample into their days of the week in one pass and 
+    estimates the days of the week of all spaces together, distributed 
+    over the ``n_jobs`` processes of the estimate options.  The 
+    parameters estimated for a space are the same as the ones of an 
+    ``Occupancy`` model of the space estimated with the same options.
+
+    Parameters
+    ----------
+    occupancy_method : occupancy method class from mpcpy.models
+    measurements : dictionary
+        Measurement dictionaries of the spaces, with one key per space.  
+        Each measurement dictionary is the same as for an ``Occupancy`` 
+        model and should only have one variable key, which represents 
+        occupancy count.
+    tz_name : string, optional
+        Name of timezone according to the package ``tzwhere``.  If 
+        ``'from_geography'``, then geography kwarg is required.
+    geography : list or tuple, optional
+        List or tuple with (latitude, longitude) in degrees.   
+
+    Attributes
+    ----------
+    models : dictionary
+        ``Occupancy`` model of each space, with the same keys as 
+        measurements.
+
+    '''
+
+    def __init__(self, occupancy_method, measurements, **kwargs):
+        '''Constructor of an occupancy portfolio object.
+
+        '''
+
+        # Initialize variables and model method
+        self.name = 'occupancy_portfolio';
+        self._occupancy_method = occupancy_method();
+        self.models = {};
+        for key in measurements.keys():
+            self.models[key] = Occupancy(occupancy_method, measurements[key], **kwargs);
+
+    def estimate(self, start_time, final_time, **kwargs):
+        '''Estimate the parameters of the models of all spaces using 
+        measurement data.
+
+        Parameters
+        ----------
+        start_time : string
+            Start time of estimation period.
+        final_time : string
+            Final time of estimation period.
+        estimate_options : dictionary, optional
+            Use the ``get_estimate_options`` method to obtain and edit.
+
+        Yields
+        ------
+        models : dictionary
+            Updates the parameter_data attribute of the model of each 
+            space, as the ``estimate`` method of ``Occupancy``.
+
+        '''
+
+        # Set the estimation options
+        if 'estimate_options' in kwargs:
+            self.set_estimate_options(kwargs['estimate_options']);
+        # Get the training data of each space, grouping the spaces measured 
+        # with the same sample
+        keys = self.models.keys();
+        samples = {};
+        for key in keys:
+            model = self.models[key];
+            model._set_time_interval(start_time, final_time);
+            model.set_estimate_options(self._occupancy_method.estimate_options);
+            ts_data_train, sample = model._occupancy_method._get_training_data(model);
+            samples.setdefault(sample, {})[key] = ts_data_train;
+        # Format the training data of the spaces of each sample for each 
+        # day of the week in one pass
+        data_train = {};
+        for sample, ts_data_train in samples.items():
+            sample_keys = ts_data_train.keys();
+            df_data_train = pd.concat([ts_data_train[key] for key in sample_keys], axis = 1);
+            points_per_day = self.models[sample_keys[0]]._occupancy_method.points_per_day;
+            data_train.update(zip(sample_keys, _format_training_days(df_data_train, sample, points_per_day)));
+        model_args = [];
+        for key in keys:
+            model = self.models[key];
+            model_args.append(model._occupancy_method._get_estimate_args(data_train[key]));
+        # Estimate the days of the week of all spaces at once
+        results = _parallel_map(self._occupancy_method._get_estimate_day_function(), [arg for args in model_args for arg in args], self._occupancy_method.estimate_options['n_jobs']);
+        # Group the results by space, in the order of the arguments
+        model_results = [];
+        i_result = 0;
+        for args in model_args:
+            model_results.append(results[i_result:i_result+len(args)]);
+            i_result = i_result + len(args);
+        for key, results in zip(keys, model_results):
+            model = self.models[key];
+            model._occupancy_method._set_estimate_results(model, results);
+
+    def simulate(self, start_time, final_time, **kwargs):
+        '''Simulate the models of all spaces with current parameter estimates.
+
+        Parameters
+        ----------
+        start_time : string
+            Start time of simulation period.
+        final_time : string
+            Final time of simulation period.
+        simulate_options : dictionary, optional
+            Use the ``get_simulate_options`` method to obtain and edit.
+
+        Yields
+        ------
+        models : dictionary
+            Updates the measurements attribute of the model of each space, 
+            as the ``simulate`` method of ``Occupancy``.
+
+        '''
+
+        # Set the simulation options
+        if 'simulate_options' in kwargs:
+            self.set_simulate_options(kwargs['simulate_options']);
+        # Simulate the model of each space
+        for key in self.models.keys():
+            self.models[key].simulate(start_time, final_time, simulate_options = self._occupancy_method.simulate_options);
+
+    def get_model(self, key):
+        '''Get the occupancy model of a space.
+
+        Parameters
+        ----------
+        key : string
+            Key of the space in the measurements of the portfolio.
+
+        Returns
+        -------
+        model : mpcpy.models.Occupancy
+            Occupancy model of the space.
+
+        '''
+
+        return self.models[key];
+
+    def set_simulate_options(self, simulate_options):
+        '''Set the simulation options for the models of all spaces.
+
+        Parameters
+        ----------
+        simulate_options : dictionary
+            Options for simulation of occupancy model.  Please see
+            documentation for specific occupancy model for more information.
+
+        '''
+
+        for key in self._occupancy_method.simulate_options.keys():
+            self._occupancy_method.simulate_options[key] = simulate_options[key];
+
+    def set_estimate_options(self, estimate_options):
+        '''Set the estimation options for the models of all spaces.
+
+        Parameters
+        ----------
+        estimate_options : dictionary
+            Options for estimation of occupancy model parameters.  Please see
+            documentation for specific occupancy model for more information.
+
+        '''
+
+        for key in self._occupancy_method.estimate_options.keys():
+            self._occupancy_method.estimate_options[key] = estimate_options[key];
+
+    def get_simulate_options(self):
+        '''Get the simulation options for the models of all spaces.
+
+        Returns
+        -------
+        simulate_options : dictionary
+            Options for simulation of occupancy model.  Please see
+            documentation for specific occupancy model for more information.
+
+        '''
+
+        return self._occupancy_method.simulate_options;
+
+    def get_estimate_options(self):
+        '''Get the estimation options for the models of all spaces.
+
+        Returns
+        -------
+        estimate_options : dictionary
+            Options for estimation of occupancy model parameters.  Please see
+            documentation for specific occupancy model for more information.
+
+        '''
+
+        return self._occupancy_method.estimate_options;
+        
 #%% Estimate Method Interface
 class _Estimate(utility._mpcpyPandas):
     '''Interface for a model identifcation method.
@@ -667,7 +964,144 @@ class _OccupancyMethod(utility._mpcpyPandas):
         pass;
     @abstractmethod
     def _simulate():
-        pass            
+        pass
+
+    def _update(self, Model):
+        '''Update the parameters with new data.  Not all occupancy methods 
+        support updates.
+
+        '''
+
+        raise NotImplementedError('Occupancy method {0} does not support updates.  Use estimate instead.'.format(type(self).__name__));
+
+    def __setstate__(self, state):
+        '''Restore a pickled occupancy method, adding the default value of
+        options that did not exist when it was pickled.
+
+        '''
+
+        self.__dict__.update(state);
+        defaults = type(self)();
+        for key, value in defaults.estimate_options.items():
+            self.estimate_options.setdefault(key, value);
+        for key, value in defaults.simulate_options.items():
+            self.simulate_options.setdefault(key, value);
+
+    def _format_training_data(self, Model):
+        '''Format the training data of all days of the week in one pass for 
+        use in parameter estimation.
+
+        Days of the training period with missing measurement points, such 
+        as partial days at the start or end of the period, are left out.
+
+        Returns
+        -------
+        data_train : list
+            Training data of each day of the week, a numpy array with one 
+            row per complete training day and one column per measurement 
+            point of the day.
+
+        '''
+
+        ts_data_train, sample = self._get_training_data(Model);
+
+        return _format_training_days(ts_data_train.to_frame(), sample, self.points_per_day)[0]
+
+    def _get_training_data(self, Model):
+        '''Get the measured occupancy of the training period and the number 
+        of measurement points in a full day.
+
+        Returns
+        -------
+        ts_data_train : ``pandas`` Series
+            Measured occupancy of the training period in base units.
+        sample : float
+            Time between measurement points in seconds.
+
+        '''
+
+        # Set the occupancy measurement key
+        self.occ_key = Model.measurements.keys()[0];
+        # Get the training data from measurements
+        ts_data_train = Model.measurements[self.occ_key]['Measured'].get_base_data()[Model.start_time:Model.final_time];
+        # Calculate the number of measurement points in a full day
+        sample = Model.measurements[self.occ_key]['Sample'].get_base_data();
+        self.points_per_day = 3600*24.0/sample;
+        # Check that points_per_day is whole number and convert to integer
+        if self.points_per_day.is_integer():
+            self.points_per_day = int(self.points_per_day);
+        else:
+            raise ValueError('Points per day of {} is not a whole number. Check occupancy measurement sampling rate.'.format(self.points_per_day));
+
+        return ts_data_train, sample
+
+    def _validate_prediction(self, Model, plot):
+        '''Compare occupancy predictions to measurements and compute their 
+        RMSE.
+
+        '''
+
+        # Load prediction and measurement data
+        prediction = Model.measurements[self.occ_key]['Simulated'].display_data();
+        std = Model.measurements[self.occ_key]['SimulatedError'].display_data();
+        measurements = Model.measurements[self.occ_key]['Measured'].display_data()[Model.start_time:Model.final_time];
+        prediction_pstd = prediction+std;
+        prediction_mstd = prediction-std;
+        prediction_mstd = (prediction_mstd>=0)*prediction_mstd;
+        
+        Model.RMSE = {};
+        for key in Model.measurements.keys():
+            data = Model.measurements[key]['Measured'].get_base_data()[Model.start_time:Model.final_time];
+            data_est = Model.measurements[key]['Simulated'].get_base_data()[Model.start_time:Model.final_time];
+            RMSE = np.sqrt(sum((data_est-data)**2)/len(data));
+            unit_class = Model.measurements[key]['Measured'].get_base_unit();
+            Model.RMSE[key] = variables.Static('RMSE_'+key, RMSE, unit_class);
+        if plot == 1:
+            # Plot data to compare
+            measurements.plot(label = 'measured', color = 'k', alpha = 0.5);
+            prediction.plot(label='prediction', color = 'r', alpha = 0.5);
+            plt.fill_between(prediction.index, prediction_pstd, prediction_mstd, color = 'r', alpha = 0.5);     
+            plt.legend();
+            plt.savefig(Model.validate_filename+'.png')        
+        
+    def _set_prediction(self, Model, prediction, std, quantile, quantiles):
+        '''Store the predicted occupancy of the days of the simulation period 
+        in the measurements of the model.
+
+        Parameters
+        ----------
+        Model : mpcpy.models.Occupancy
+            Model of which to set the measurements attribute.
+        prediction : numpy array
+            Mean occupancy, with one row per day of the simulation period.
+        std : numpy array
+            Standard deviation of the occupancy, with the shape of 
+            prediction.
+        quantile : numpy array
+            Occupancy quantiles, with one entry per quantile probability of 
+            the shape of prediction.
+        quantiles : list
+            Quantile probabilities.
+
+        '''
+
+        # Convert the predictions to pandas timeseries
+        start_time = pd.datetime(Model.start_time.year,Model.start_time.month, Model.start_time.day);
+        freq = str(int(Model.measurements[self.occ_key]['Sample'].get_base_data()))+'s';
+        index = pd.date_range(start_time, periods = prediction.size, freq = freq);
+        ts_pred = pd.Series(data = prediction.ravel(), index = index);
+        ts_std = pd.Series(data = std.ravel(), index = index);
+        ts_quantile = [pd.Series(data = quantile[i].ravel(), index = index) for i in range(len(quantiles))];
+        # Store simulation results in Model measurement dictionary
+        unit = Model.measurements[self.occ_key]['Measured'].get_base_unit();
+        Model.measurements[self.occ_key]['Simulated'] = variables.Timeseries('prediction', ts_pred, unit);
+        Model.measurements[self.occ_key]['SimulatedError'] = variables.Timeseries('prediction', ts_std, unit);
+        # Remove the quantiles of previous simulations
+        for key in Model.measurements[self.occ_key].keys():
+            if key.startswith('SimulatedQuantile'):
+                del Model.measurements[self.occ_key][key];
+        for i in range(len(quantiles)):
+            Model.measurements[self.occ_key]['SimulatedQuantile{0:g}'.format(100*quantiles[i])] = variables.Timeseries('prediction', ts_quantile[i], unit);
              
 #%% Estimate Method Interface Implementations
 class JModelica(_Estimate):
@@ -916,9 +1350,17 @@ class QueueModel(_OccupancyMethod):
         -res : defines the resolution of grid search for the optimal breakpoint placement 
         -margin : specifies the minimum distance between two adjacent breakpoints
         -n_max : defines the upper limit of the number of breakpoints returned by the algorithm
+        -n_jobs : defines the number of processes over which the estimation of the days of the week is distributed.  1 estimates the days one after another and -1 uses all available cpus.
+        -score_method : 'monte_carlo' to score the candidate breakpoints by monte-carlo simulation of the queue or 'analytic' to score them with the mean occupancy computed in closed form, which is deterministic and faster.
+        -coarse_factor : defines the downsampling factor of the multi-resolution breakpoint search.  The breakpoints are placed on the data downsampled by this factor and then refined locally at full resolution, which trades accuracy for speed on high resolution data.  1 places the breakpoints at full resolution.
+        -seed : defines the seed of the random numbers drawn by the estimation.  Each day of the week draws from its own stream derived from the seed, so that the estimation is reproducible and does not depend on n_jobs.  None draws from the global numpy and python random states.
     simulate_options : dictionary
         Specifies options for model simulation.  
         -iter_num : defines the number of iterations for monte-carlo simulation.
+        -method : 'monte_carlo' to predict occupancy by monte-carlo simulation or 'analytic' to compute the mean and standard deviation of the predicted occupancy in closed form, in which case iter_num is not used.
+        -quantiles : list of probabilities of the occupancy quantiles to predict, each between 0 and 1.  The quantile of probability p is stored as the ``'SimulatedQuantile<100p>'`` measurement key, e.g. ``'SimulatedQuantile90'`` for 0.9.  Monte-carlo quantiles are computed from streaming counts of the simulated occupancy values, so memory does not grow with iter_num.  Empty by default.
+        -seed : defines the seed of the random numbers drawn by monte-carlo simulation.  Each simulated date draws from its own stream derived from the seed and the date, so that the prediction of a date is reproducible and does not depend on the simulation period.  None draws from the global numpy random state.
+        -n_jobs : defines the number of processes over which the monte-carlo simulation of the days of the simulation period is distributed.  1 simulates the days one after another and -1 uses all available cpus.  With a seed, the prediction does not depend on n_jobs.
 
     '''
 
@@ -932,44 +1374,82 @@ class QueueModel(_OccupancyMethod):
         self.estimate_options['res'] = 3;
         self.estimate_options['margin'] = 3;
         self.estimate_options['n_max'] = 24;
+        self.estimate_options['n_jobs'] = 1;
+        self.estimate_options['score_method'] = 'monte_carlo';
+        self.estimate_options['coarse_factor'] = 1;
+        self.estimate_options['seed'] = None;
         self.simulate_options = {};
         self.simulate_options['iter_num'] = 100;
+        self.simulate_options['method'] = 'monte_carlo';
+        self.simulate_options['quantiles'] = [];
+        self.simulate_options['seed'] = None;
+        self.simulate_options['n_jobs'] = 1;
         
     def _estimate(self, Model):
         '''Use measured occupancy data to estimate the queue model parameters.
 
         '''
 
-        # Set estimation options
-        res = self.estimate_options['res'];
-        margin = self.estimate_options['margin'];
-        n_max = self.estimate_options['n_max'];
+        # Format training data for each day of the week
+        data_train = self._format_training_data(Model);
+        # Estimate a queue model for each day of the week using training data
+        args = self._get_estimate_args(data_train);
+        results = _parallel_map(self._get_estimate_day_function(), args, self.estimate_options['n_jobs']);
+        self._set_estimate_results(Model, results);
+
+    def _get_estimate_args(self, data_train):
+        '''Get the arguments of the estimation of each day of the week.
+
+        Parameters
+        ----------
+        data_train : list
+            Training data of each day of the week, see 
+            ``_format_training_data``.
+
+        Returns
+        -------
+        args : list
+            Arguments of the function returned by 
+            ``_get_estimate_day_function`` for each day of the week.
+
+        '''
+
+        # Number of training days of each day of the week, the weights of 
+        # the running statistics of incremental updates
+        self.n_train = np.array([data.shape[0] for data in data_train]);
+        estimate_options = dict(self.estimate_options);
+        if 'seed' in estimate_options:
+            estimate_options['seed'] = _get_process_seed(estimate_options['seed'], estimate_options['n_jobs']);
+
+        return [(data_train[day], estimate_options, day) for day in range(7)]
+
+    def _set_estimate_results(self, Model, results):
+        '''Store the estimated parameters of each day of the week.
+
+        Parameters
+        ----------
+        Model : mpcpy.models.Occupancy
+            Model of which to set the parameters_data attribute.
+        results : list
+            Results of the function returned by 
+            ``_get_estimate_day_function`` for each day of the week.
+
+        '''
+
         # Initialize variables
         Model.parameters_data['lam'] = {};
         Model.parameters_data['mu'] = {};
         self.seg_point = [];
         self.empty_time = [];
-        # Estimate a queue model for each day of the week using training data
+        self.lam_sum = [];
+        self.mu_sum = [];
         for day in range(7):
-            # Format training data
-            self._format_training_data(Model, day);
-            # Find breakpoints - segment the day into some homogeneous pieces
-            self.seg_point.append(adaptive_breakpoint_placement(self.data_train,res=res,margin=margin,n_max=n_max));
-            # Learn the arrival and departure rates for each segment
-            self.seg_point[day] = np.sort(self.seg_point[day])
-            val_size = self.data_train.shape[0];
-            seg_num = len(self.seg_point[day])+1;
-            lam_all = np.empty((seg_num,val_size));
-            mu_all = np.empty((seg_num,val_size));
-            presence = np.where(np.mean(self.data_train,axis=0)!=0);
-            self.empty_time.append(presence[0][-1]+1);
-            for i in range(val_size):
-                x = self.data_train[i,:];
-                [lam_temp, mu_temp] = parameter_inference_given_segment(x, self.seg_point[day],self.empty_time[day]);
-                lam_all[:,i] = lam_temp;
-                mu_all[:,i] = mu_temp;
-            self.lam = np.mean(lam_all,axis = 1);
-            self.mu = np.mean(mu_all,axis = 1);
+            seg_point, empty_time, self.lam, self.mu = results[day];
+            self.seg_point.append(seg_point);
+            self.empty_time.append(empty_time);
+            # Sums of the rates of the training days, for incremental updates
+            self.lam_sum.append(self.lam*self.n_train[day]);
+            self.mu_sum.append(self.mu*self.n_train[day]);
             # Store estimated model parameters
             Model.parameters_data['lam'][day] = {};
             Model.parameters_data['lam'][day]['Free'] = variables.Static('lam_'+str(day)+'_free', True, units.boolean);
@@ -978,129 +1458,638 @@ class QueueModel(_OccupancyMethod):
             Model.parameters_data['mu'][day]['Free'] = variables.Static('mu_'+str(day)+'_free', True, units.boolean);
             Model.parameters_data['mu'][day]['Value'] = variables.Static('mu_'+str(day)+'_value', self.mu, units.unit1);
         
+    def _update(self, Model):
+        '''Update the queue model parameters with new measured occupancy 
+        data, keeping the breakpoints of the last estimation.
+
+        The estimated rates of each segment are the mean of the rates of 
+        the training days, so the sums of the rates and the number of 
+        training days of each day of the week are sufficient to add the 
+        rates of the new days.
+
+        '''
+
+        if not hasattr(self, 'n_train'):
+            raise ValueError('The occupancy model must be estimated before it is updated.');
+        # Format the new data for each day of the week
+        data_train = self._format_training_data(Model);
+        for day in range(7):
+            if data_train[day].shape[0] == 0:
+                continue;
+            # Infer the rates of the segments of the new days
+            lam_all, mu_all = parameter_inference_given_segments(data_train[day], self.seg_point[day], self.empty_time[day]);
+            self.lam_sum[day] = self.lam_sum[day] + np.sum(lam_all, axis = 1);
+            self.mu_sum[day] = self.mu_sum[day] + np.sum(mu_all, axis = 1);
+            self.n_train[day] = self.n_train[day] + data_train[day].shape[0];
+            # Store updated model parameters
+            self.lam = self.lam_sum[day]/self.n_train[day];
+            self.mu = self.mu_sum[day]/self.n_train[day];
+            Model.parameters_data['lam'][day]['Value'] = variables.Static('lam_'+str(day)+'_value', self.lam, units.unit1);
+            Model.parameters_data['mu'][day]['Value'] = variables.Static('mu_'+str(day)+'_value', self.mu, units.unit1);
+
     def _validate(self, Model, plot):
         '''Compare occupancy predictions to measurements.
 
         '''
 
-        # Load prediction and measurement data
-        prediction = Model.measurements[self.occ_key]['Simulated'].display_data();
-        std = Model.measurements[self.occ_key]['SimulatedError'].display_data();
-        measurements = Model.measurements[self.occ_key]['Measured'].display_data()[Model.start_time:Model.final_time];
-        prediction_pstd = prediction+std;
-        prediction_mstd = prediction-std;
-        prediction_mstd = (prediction_mstd>=0)*prediction_mstd;
-        
-        Model.RMSE = {};
-        for key in Model.measurements.keys():
-            data = Model.measurements[key]['Measured'].get_base_data()[Model.start_time:Model.final_time];
-            data_est = Model.measurements[key]['Simulated'].get_base_data()[Model.start_time:Model.final_time];
-            RMSE = np.sqrt(sum((data_est-data)**2)/len(data));
-            unit_class = Model.measurements[key]['Measured'].get_base_unit();
-            Model.RMSE[key] = variables.Static('RMSE_'+key, RMSE, unit_class);
-        if plot == 1:
-            # Plot data to compare
-            measurements.plot(label = 'measured', color = 'k', alpha = 0.5);
-            prediction.plot(label='prediction', color = 'r', alpha = 0.5);
-            plt.fill_between(prediction.index, prediction_pstd, prediction_mstd, color = 'r', alpha = 0.5);     
-            plt.legend();
-            plt.savefig(Model.validate_filename+'.png')        
-        
+        self._validate_prediction(Model, plot);
+
     def _simulate(self, Model):
-        '''Use Monte Carlo simulation to predict an occupancy timeseries.
+        '''Use Monte Carlo simulation or the analytic queue solution to 
+        predict an occupancy timeseries.
 
         '''
 
         # Set the number of simulations for the Monte Carlo 
         iter_num = self.simulate_options['iter_num'];
-        # Initialize variables 
-        ts_pred = pd.Series();
-        ts_std = pd.Series();
-        d = 0;
+        # Check the simulation method
+        method = self.simulate_options['method'];
+        if method not in ['monte_carlo', 'analytic']:
+            raise ValueError('Simulation method "{0}" is not valid.  Must be "monte_carlo" or "analytic".'.format(method));
+        # Check the quantile probabilities
+        quantiles = self.simulate_options['quantiles'];
+        for q in quantiles:
+            if not 0 < q < 1:
+                raise ValueError('Quantile probability {0} is not valid.  Must be between 0 and 1.'.format(q));
         # Get weekdays of simulation time period
         date_range = pd.date_range(Model.start_time, Model.final_time, freq = 'D');
-        # Monte Carlo simulate each day of the simulation time period
-        for day in date_range.weekday:
-            seg_point_added = np.concatenate((np.array([0]),self.seg_point[day], np.array([self.points_per_day])))
-            lam_vec = np.empty((self.points_per_day,))
-            lam_vec[:] = np.NAN
-            mu_vec = np.empty((self.points_per_day,))
-            mu_vec[:] = np.NAN
-            jmptimes_mc = [None]*iter_num # create an empty list of size iter_num
-            syssize_mc = np.empty((self.points_per_day,iter_num))
-            syssize_mc[:] = np.NAN
-            time_int = np.arange(self.points_per_day)
-            nstart = 0
-            for i in range(len(seg_point_added)-1):
-                lam = Model.parameters_data['lam'][day]['Value'].get_base_data()[i];
-                mu = Model.parameters_data['mu'][day]['Value'].get_base_data()[i];
-                lam_vec[seg_point_added[i]:seg_point_added[i+1]] = lam;
-                mu_vec[seg_point_added[i]:seg_point_added[i+1]] = mu;
-            for iter_idx in range(iter_num):
-                jmptimes, syssize = simulate_queue(self.points_per_day, lam_vec, mu_vec, nstart, self.empty_time[day])
-                if syssize is None:
-                    jmptimes_mc[iter_idx] = None
-                    syssize_mc[:, iter_idx] = np.zeros((self.points_per_day,))
-                    continue
-                if np.any(syssize <0):
-                    pdb.set_trace()
-                    raise ValueError('negative syssize')
-                if jmptimes is None:
-                    jmptimes_mc[iter_idx] = 0
-                    syssize_mc[:, iter_idx] = 0
-                else:
-                    # round jmptimes to the nearest integer
-                    jmptimes_d, ia = unique_last(np.round(jmptimes))
-                    syssize_d = syssize[ia]
-                    if jmptimes_d[0] != 0:
-                        jmptimes_int = np.insert(jmptimes_d, 0, 0)
-                        syssize_int = np.insert(syssize_d, 0, 0)
-                    else:
-                        jmptimes_int = jmptimes_d
-                        syssize_int = syssize_d
-                    vq = interp1(jmptimes_int, syssize_int, time_int)
-                    jmptimes_mc[iter_idx] = jmptimes_d
-                    syssize_mc[:, iter_idx] = vq
-            prediction = np.mean(syssize_mc, axis=1);
-            std = np.std(syssize_mc, axis=1);
-            # Convert current prediction to pandas timeseries
-            start_time = pd.datetime(Model.start_time.year,Model.start_time.month, Model.start_time.day)+timedelta(days=d);
-            final_time = start_time+timedelta(days=1)-timedelta(seconds = Model.measurements[self.occ_key]['Sample'].get_base_data());
-            freq = str(int(Model.measurements[self.occ_key]['Sample'].get_base_data()))+'s';
-            index = pd.date_range(start_time, final_time, freq = freq);
-            ts_pred_new = pd.Series(data = prediction, index = index);
-            ts_std_new = pd.Series(data = std, index = index);
-            # Join current day's prediction to past predictions
-            ts_pred = pd.concat((ts_pred, ts_pred_new), axis = 0);
-            ts_std = pd.concat((ts_std, ts_std_new), axis = 0);
-            # Increment the day counter
-            d = d + 1;
-        # Store simulation results in Model measurement dictionary
-        unit = Model.measurements[self.occ_key]['Measured'].get_base_unit();
-        Model.measurements[self.occ_key]['Simulated'] = variables.Timeseries('prediction', ts_pred, unit);
-        Model.measurements[self.occ_key]['SimulatedError'] = variables.Timeseries('prediction', ts_std, unit);
+        n_days = len(date_range);
+        # Arrival and departure rate profiles of each day of the week
+        lam_profile, mu_profile = self._get_rate_profiles(Model);
+        nstart = 0;
+        # Preallocate the predictions of the whole simulation time period, 
+        # with one row per day
+        prediction = np.empty((n_days, self.points_per_day));
+        std = np.empty((n_days, self.points_per_day));
+        quantile = np.empty((len(quantiles), n_days, self.points_per_day));
+        if method == 'analytic':
+            # Compute the occupancy mean, variance and quantiles in closed 
+            # form once for each day of the week
+            for day in np.unique(date_range.weekday):
+                rows = date_range.weekday == day;
+                prediction_day, var_day = occupancy_moments(self.points_per_day, lam_profile[day], mu_profile[day], nstart, self.empty_time[day]);
+                prediction[rows] = prediction_day;
+                std[rows] = np.sqrt(var_day);
+                if quantiles:
+                    quantile[:,rows,:] = occupancy_quantiles(self.points_per_day, lam_profile[day], mu_profile[day], nstart, self.empty_time[day], quantiles)[:,np.newaxis,:];
+        else:
+            # Monte Carlo simulate each day of the simulation time period, 
+            # in chunks of iterations reduced to their statistics on the fly,
+            # distributed over n_jobs processes
+            n_jobs = self.simulate_options['n_jobs'];
+            seed = _get_process_seed(self.simulate_options['seed'], n_jobs);
+            args = [];
+            for d in range(n_days):
+                day = date_range[d].weekday();
+                args.append((self.points_per_day, lam_profile[day], mu_profile[day], nstart, self.empty_time[day], iter_num, quantiles, seed, date_range[d].toordinal()));
+            results = _parallel_map(_simulate_queue_date, args, n_jobs);
+            for d in range(n_days):
+                prediction[d], std[d], quantile[:,d,:] = results[d];
+        # Store the predictions in Model measurement dictionary
+        self._set_prediction(Model, prediction, std, quantile, quantiles);
         
-    def _format_training_data(self, Model, day):
-        '''Format the training data for use in parameter estimation.
+    def _get_rate_profiles(self, Model):
+        '''Get the arrival and departure rates of each day of the week at 
+        each point of the day.
+
+        Returns
+        -------
+        lam_profile : numpy array
+            Arrival rates, with one row per day of the week.
+        mu_profile : numpy array
+            Departure rates, with one row per day of the week.
 
         '''
 
-        # Set the occupancy measurement key
-        self.occ_key = Model.measurements.keys()[0];
-        # Get the training data from measurements
-        self.df_data_train = Model.measurements[self.occ_key]['Measured'].get_base_data()[Model.start_time:Model.final_time].to_frame(name='occ');        
-        # Specify the weekday number of each measurement point
-        self.df_data_train['day'] = pd.Series(self.df_data_train.index.weekday, index=self.df_data_train.index);
-        # Calculate the number of measurement points in a full day
-        self.points_per_day = 3600*24.0/Model.measurements[self.occ_key]['Sample'].get_base_data();
-        # Check that points_per_day is whole number and convert to integer
-        if self.points_per_day.is_integer():
-            self.points_per_day = int(self.points_per_day);
+        lam_profile = np.empty((7, self.points_per_day));
+        mu_profile = np.empty((7, self.points_per_day));
+        for day in range(7):
+            seg_length = np.diff(np.concatenate((np.array([0]), self.seg_point[day], np.array([self.points_per_day])))).astype(int);
+            lam_profile[day] = np.repeat(Model.parameters_data['lam'][day]['Value'].get_base_data(), seg_length);
+            mu_profile[day] = np.repeat(Model.parameters_data['mu'][day]['Value'].get_base_data(), seg_length);
+
+        return lam_profile, mu_profile
+
+    def _get_estimate_day_function(self):
+        '''Return the function estimating the parameters of one day of the week.
+
+        The function is defined at the module level so that it can be run
+        in a process pool.
+
+        '''
+
+        return _estimate_queue_day;
+
+class QueueModelPELT(QueueModel):
+    '''Occupancy presence prediction based on a queueing approach with 
+    optimal breakpoint placement.
+
+    The breakpoints of each day of the week minimize the penalized negative 
+    log-likelihood of the measured arrival and departure counts, modeled as 
+    Poisson processes with piecewise constant rates.  They are found with 
+    the Pruned Exact Linear Time (PELT) algorithm, without simulation of 
+    the queue, so that the estimation is reproducible.  The time after 
+    which the space is empty is always a breakpoint.  Prediction is the 
+    same as for ``QueueModel``.
+
+    Killick, R., P. Fearnhead and I. A. Eckley (2012). "Optimal detection 
+    of changepoints with a linear computational cost." Journal of the 
+    American Statistical Association, 107(500), 1590-1598.
+
+    Attributes
+    ----------
+    estimate_options : dictionary
+        Specifies options for model estimation with the following keys:
+        -margin : specifies the minimum distance between two adjacent breakpoints
+        -penalty : defines the penalty added to the negative log-likelihood for each segment.  None uses the Bayesian information criterion of the two rates of a segment.  Larger penalties place fewer breakpoints.
+        -n_jobs : defines the number of processes over which the estimation of the days of the week is distributed.  1 estimates the days one after another and -1 uses all available cpus.
+    simulate_options : dictionary
+        Specifies options for model simulation, see ``QueueModel``.
+
+    '''
+
+    def __init__(self):
+        '''Constructor of an occupancy model object using a queueing approach 
+        with optimal breakpoint placement.
+
+        '''
+
+        super(QueueModelPELT, self).__init__();
+        # Initialize options
+        self.estimate_options = {};
+        self.estimate_options['margin'] = 3;
+        self.estimate_options['penalty'] = None;
+        self.estimate_options['n_jobs'] = 1;
+
+    def _get_estimate_day_function(self):
+        '''Return the function estimating the parameters of one day of the week.
+
+        '''
+
+        return _estimate_queue_pelt_day;
+
+class MarkovModel(_OccupancyMethod):
+    '''Occupancy count prediction based on an inhomogeneous Markov chain.
+
+    The occupancy count at each measurement point of a day of the week 
+    depends on the count at the previous point through a transition matrix, 
+    estimated for each point of each day of the week by counting the 
+    transitions of the training data.  Prediction propagates the 
+    distribution of the occupancy count with matrix products, without 
+    event-driven simulation of the occupants, which makes the method a 
+    cheap alternative to ``QueueModel`` for small spaces with few occupants.
+
+    See ``occupant.occupancy.markov`` for more information.
+
+    Attributes
+    ----------
+    estimate_options : dictionary
+        Specifies options for model estimation with the following keys:
+        -max_occupancy : defines the largest occupancy count of the states of the chain.  Measured counts are rounded and clipped to it.  None uses the largest count of the training data.  The memory of the transition matrices grows with its square.
+        -n_jobs : defines the number of processes over which the estimation of the days of the week is distributed.  1 estimates the days one after another and -1 uses all available cpus.
+    simulate_options : dictionary
+        Specifies options for model simulation.
+        -iter_num : defines the number of iterations for monte-carlo simulation.
+        -method : 'analytic' to compute the distribution of the predicted occupancy exactly by propagation of the chain or 'monte_carlo' to estimate it by simulation, in which case iter_num is used.
+        -quantiles : list of probabilities of the occupancy quantiles to predict, each between 0 and 1, stored as for ``QueueModel``.  Empty by default.
+        -seed : defines the seed of the random numbers drawn by monte-carlo simulation, as for ``QueueModel``.
+
+    '''
+
+    def __init__(self):
+        '''Constructor of an occupancy model object using a Markov chain.
+
+        '''
+
+        # Initialize options
+        self.estimate_options = {};
+        self.estimate_options['max_occupancy'] = None;
+        self.estimate_options['n_jobs'] = 1;
+        self.simulate_options = {};
+        self.simulate_options['iter_num'] = 100;
+        self.simulate_options['method'] = 'analytic';
+        self.simulate_options['quantiles'] = [];
+        self.simulate_options['seed'] = None;
+
+    def _estimate(self, Model):
+        '''Use measured occupancy data to estimate the transition matrices 
+        of the chain.
+
+        '''
+
+        # Format training data for each day of the week
+        data_train = self._format_training_data(Model);
+        # Count the transitions of each day of the week using training data
+        args = self._get_estimate_args(data_train);
+        results = _parallel_map(self._get_estimate_day_function(), args, self.estimate_options['n_jobs']);
+        self._set_estimate_results(Model, results);
+
+    def _get_estimate_args(self, data_train):
+        '''Get the arguments of the estimation of each day of the week.
+
+        Parameters
+        ----------
+        data_train : list
+            Training data of each day of the week, see 
+            ``_format_training_data``.
+
+        Returns
+        -------
+        args : list
+            Arguments of the function returned by 
+            ``_get_estimate_day_function`` for each day of the week.
+
+        '''
+
+        # All days of the week share the states of the chain
+        max_occupancy = self.estimate_options['max_occupancy'];
+        if max_occupancy is None:
+            max_occupancy = max([np.rint(np.max(data)) if data.size else 0 for data in data_train]);
+        self.n_states = int(max_occupancy)+1;
+
+        return [(data_train[day], self.n_states) for day in range(7)]
+
+    def _set_estimate_results(self, Model, results):
+        '''Store the transition counts of each day of the week and the 
+        estimated parameters.
+
+        Parameters
+        ----------
+        Model : mpcpy.models.Occupancy
+            Model of which to set the parameters_data attribute.
+        results : list
+            Results of the function returned by 
+            ``_get_estimate_day_function`` for each day of the week.
+
+        '''
+
+        # The transition counts are the running statistics of updates
+        self.initial = [result[0] for result in results];
+        self.counts = [result[1] for result in results];
+        Model.parameters_data['p0'] = {};
+        self.p0 = [None]*7;
+        self.transition = [None]*7;
+        for day in range(7):
+            Model.parameters_data['p0'][day] = {};
+            Model.parameters_data['p0'][day]['Free'] = variables.Static('p0_'+str(day)+'_free', True, units.boolean);
+            self._set_transition_matrices(Model, day);
+
+    def _set_transition_matrices(self, Model, day):
+        '''Estimate the initial distribution and transition matrices of a 
+        day of the week from its transition counts.
+
+        '''
+
+        self.p0[day], self.transition[day] = transition_matrices(self.initial[day], self.counts[day]);
+        Model.parameters_data['p0'][day]['Value'] = variables.Static('p0_'+str(day)+'_value', self.p0[day], units.unit1);
+
+    def _update(self, Model):
+        '''Update the transition matrices with new measured occupancy data.
+
+        The transition counts are sufficient statistics of the transition 
+        matrices, so only the transitions of the new data are counted.  
+        Counts above the largest state of the chain are clipped to it.
+
+        '''
+
+        if not hasattr(self, 'counts'):
+            raise ValueError('The occupancy model must be estimated before it is updated.');
+        # Format the new data for each day of the week
+        data_train = self._format_training_data(Model);
+        for day in range(7):
+            if data_train[day].shape[0] == 0:
+                continue;
+            initial, counts = transition_counts(data_train[day], self.n_states);
+            self.initial[day] = self.initial[day] + initial;
+            self.counts[day] = self.counts[day] + counts;
+            self._set_transition_matrices(Model, day);
+
+    def _validate(self, Model, plot):
+        '''Compare occupancy predictions to measurements.
+
+        '''
+
+        self._validate_prediction(Model, plot);
+
+    def _simulate(self, Model):
+        '''Propagate or Monte Carlo simulate the chain to predict an 
+        occupancy timeseries.
+
+        '''
+
+        # Check the simulation method
+        method = self.simulate_options['method'];
+        if method not in ['monte_carlo', 'analytic']:
+            raise ValueError('Simulation method "{0}" is not valid.  Must be "monte_carlo" or "analytic".'.format(method));
+        # Check the quantile probabilities
+        quantiles = self.simulate_options['quantiles'];
+        for q in quantiles:
+            if not 0 < q < 1:
+                raise ValueError('Quantile probability {0} is not valid.  Must be between 0 and 1.'.format(q));
+        # Get weekdays of simulation time period
+        date_range = pd.date_range(Model.start_time, Model.final_time, freq = 'D');
+        n_days = len(date_range);
+        # Preallocate the predictions of the whole simulation time period, 
+        # with one row per day
+        prediction = np.empty((n_days, self.points_per_day));
+        std = np.empty((n_days, self.points_per_day));
+        quantile = np.empty((len(quantiles), n_days, self.points_per_day));
+        if method == 'analytic':
+            # Propagate the distribution once for each day of the week
+            for day in np.unique(date_range.weekday):
+                rows = date_range.weekday == day;
+                dist = propagate_distribution(self.p0[day], self.transition[day]);
+                prediction_day, std_day, quantile_day = distribution_statistics(dist, quantiles);
+                prediction[rows] = prediction_day;
+                std[rows] = std_day;
+                quantile[:,rows,:] = quantile_day[:,np.newaxis,:];
         else:
-            raise ValueError('Points per day of {} is not a whole number. Check occupancy measurement sampling rate.'.format(self.points_per_day));      
-        # Isolate the measurement data for the day of interest
-        df_interest = self.df_data_train[self.df_data_train['day'] == day];
-        # Format isolated data for use in parameter estimation procedure
-        self.data_train = df_interest['occ'].as_matrix();
-        self.data_train = self.data_train.reshape((self.data_train.size/self.points_per_day, self.points_per_day));
-    
+            # Monte Carlo simulate each day of the simulation time period
+            for d in range(n_days):
+                day = date_range[d].weekday();
+                random_state = random_stream(self.simulate_options['seed'], date_range[d].toordinal());
+                states = simulate_markov_chain_batch(self.p0[day], self.transition[day], self.simulate_options['iter_num'], random_state);
+                dist = empirical_distribution(states, self.n_states);
+                prediction[d], std[d], quantile[:,d,:] = distribution_statistics(dist, quantiles);
+        # Store the predictions in Model measurement dictionary
+        self._set_prediction(Model, prediction, std, quantile, quantiles);
+
+    def _get_estimate_day_function(self):
+        '''Return the function estimating the parameters of one day of the week.
+
+        '''
+
+        return _estimate_markov_day;
+
+#%% Occupancy Method Functions
+def _format_training_days(df_data_train, sample, points_per_day):
+    '''Format the training data of spaces measured with the same sample 
+    into days of the week in one pass.
+
+    Parameters
+    ----------
+    df_data_train : ``pandas`` DataFrame
+        Measured occupancy of the training period in base units, with one 
+        column per space.  Points at which a space was not measured are 
+        nan.
+    sample : float
+        Time between measurement points in seconds.
+    points_per_day : int
+        Number of measurement points in a full day.
+
+    Returns
+    -------
+    data_train : list
+        Training data of each day of the week of each space, see 
+        ``_format_training_data``.
+
+    '''
+
+    n_spaces = df_data_train.shape[1];
+    if df_data_train.shape[0] == 0:
+        return [[np.empty((0, points_per_day)) for day in range(7)] for j in range(n_spaces)]
+    # Place the measurement points in a grid of spaces, days and points of 
+    # the day, from the seconds since the epoch of the UTC index
+    seconds = np.asarray(df_data_train.index.asi8) // 10**9;
+    day_num = seconds // 86400;
+    point = ((seconds % 86400)//sample).astype(int);
+    data_days = np.full((n_spaces, day_num[-1]-day_num[0]+1, points_per_day), np.nan);
+    # Only set the points at which each space was measured, since the 
+    # index joins the indices of all spaces
+    values = df_data_train.values;
+    rows, spaces = np.nonzero(~np.isnan(values));
+    data_days[spaces, day_num[rows]-day_num[0], point[rows]] = values[rows, spaces];
+    # Leave out days with missing points
+    complete = ~np.any(np.isnan(data_days), axis = 2);
+    # The epoch is a Thursday, the day of the week 3
+    weekday = (day_num[0] + np.arange(data_days.shape[1]) + 3) % 7;
+
+    return [[data_days[j][complete[j] & (weekday == day)] for day in range(7)] for j in range(n_spaces)]
+
+def _estimate_queue_day(args):
+    '''Estimate the queue model parameters of one day of the week.
+
+    Defined at the module level so that it can be run in a process pool.
+
+    Parameters
+    ----------
+    args : tuple
+        (data_train, estimate_options, day), where data_train is a numpy 
+        array with the training data of the day of the week, with one row 
+        per training day, estimate_options are the ``QueueModel`` 
+        estimate options and day is the day of the week.
+
+    Returns
+    -------
+    seg_point : numpy array
+        Sorted breakpoints of the day.
+    empty_time : int
+        Time after which the space is empty.
+    lam : numpy array
+        Arrival rate of each segment.
+    mu : numpy array
+        Departure rate of each segment.
+
+    '''
+
+    data_train, estimate_options, day = args;
+    if not np.any(data_train):
+        return _estimate_queue_unoccupied(data_train)
+    random_state = random_stream(estimate_options['seed'], day);
+    # Find breakpoints - segment the day into some homogeneous pieces
+    seg_point = coarse_to_fine_breakpoint_placement(data_train, res=estimate_options['res'], margin=estimate_options['margin'], n_max=estimate_options['n_max'], factor=estimate_options['coarse_factor'], score_method=estimate_options['score_method'], random_state=random_state);
+
+    return _estimate_queue_segments(data_train, seg_point)
+
+def _estimate_queue_pelt_day(args):
+    '''Estimate the queue model parameters of one day of the week with 
+    optimal breakpoint placement.
+
+    Defined at the module level so that it can be run in a process pool.
+
+    Parameters
+    ----------
+    args : tuple
+        (data_train, estimate_options, day), where data_train is a numpy 
+        array with the training data of the day of the week, with one row 
+        per training day, estimate_options are the ``QueueModelPELT`` 
+        estimate options and day is the day of the week.
+
+    Returns
+    -------
+    See ``_estimate_queue_day``.
+
+    '''
+
+    data_train, estimate_options, day = args;
+    if not np.any(data_train):
+        return _estimate_queue_unoccupied(data_train)
+    # Find breakpoints - segment the day into some homogeneous pieces
+    seg_point = optimal_breakpoint_placement(data_train, margin=estimate_options['margin'], penalty=estimate_options['penalty']);
+
+    return _estimate_queue_segments(data_train, seg_point)
+
+def _estimate_queue_segments(data_train, seg_point):
+    '''Estimate the arrival and departure rates of the segments of one day 
+    of the week.
+
+    Parameters
+    ----------
+    data_train : numpy array
+        Training data of the day of the week, with one row per training day.
+    seg_point : list
+        Breakpoints of the day.
+
+    Returns
+    -------
+    See ``_estimate_queue_day``.
+
+    '''
+
+    # Sort the breakpoints, dropping repeated ones that would give empty 
+    # segments
+    seg_point = np.unique(seg_point);
+    # Learn the arrival and departure rates for each segment of all 
+    # training days at once
+    presence = np.where(np.mean(data_train,axis=0)!=0);
+    empty_time = presence[0][-1]+1;
+    lam_all, mu_all = parameter_inference_given_segments(data_train, seg_point, empty_time);
+    lam = np.mean(lam_all,axis = 1);
+    mu = np.mean(mu_all,axis = 1);
+
+    return seg_point, empty_time, lam, mu
+
+def _estimate_queue_unoccupied(data_train):
+    '''Estimate the queue model parameters of a day of the week during which 
+    the space is never occupied, as a single segment without arrivals.
+
+    Parameters
+    ----------
+    data_train : numpy array
+        Training data of the day of the week, with one row per training day.
+
+    Returns
+    -------
+    See ``_estimate_queue_day``.
+
+    '''
+
+    return np.array([], dtype = int), 0, np.zeros((1,)), np.zeros((1,))
+
+def _estimate_markov_day(args):
+    '''Count the transitions of the Markov chain of one day of the week.
+
+    Defined at the module level so that it can be run in a process pool.
+
+    Parameters
+    ----------
+    args : tuple
+        (data_train, n_states), where data_train is a numpy array with the 
+        training data of the day of the week, with one row per training 
+        day, and n_states is the number of states of the chain.
+
+    Returns
+    -------
+    initial : numpy array
+        Number of training days starting in each state.
+    counts : numpy array
+        Number of transitions between each pair of states at each point of 
+        the day.
+
+    '''
+
+    data_train, n_states = args;
+
+    return transition_counts(data_train, n_states)
+
+def _simulate_queue_date(args):
+    '''Monte Carlo simulate the occupancy of one date of a simulation period.
+
+    Defined at the module level so that it can be run in a process pool.
+
+    Parameters
+    ----------
+    args : tuple
+        (points_per_day, lam, mu, nstart, empty_time, iter_num, quantiles, 
+        seed, ordinal), where lam and mu are the rate profiles of the day of 
+        the week of the date, seed is the ``QueueModel`` simulate option and 
+        ordinal is the proleptic Gregorian ordinal of the date, which 
+        identifies its random stream.
+
+    Returns
+    -------
+    prediction : numpy array
+        Mean occupancy at each point of the day.
+    std : numpy array
+        Standard deviation of the occupancy at each point of the day.
+    quantile : numpy array
+        Quantiles of the occupancy at each point of the day, with one row 
+        per quantile probability.
+
+    '''
+
+    points_per_day, lam, mu, nstart, empty_time, iter_num, quantiles, seed, ordinal = args;
+    random_state = random_stream(seed, ordinal);
+
+    return simulate_queue_statistics(points_per_day, lam, mu, nstart, empty_time, iter_num, quantiles, random_state = random_state)
+
+def _get_process_seed(seed, n_jobs):
+    '''Get the seed of the random streams of work distributed over processes.
+
+    Worker processes start from a copy of the global random state of the 
+    parent process and would all draw the same random numbers, so without 
+    a seed, a seed is drawn from the global numpy random state when more 
+    than one process is used.
+
+    Parameters
+    ----------
+    seed : int or None
+        Seed option.
+    n_jobs : int
+        Number of processes.
+
+    Returns
+    -------
+    seed : int or None
+        Seed of the random streams, None to draw from the global random 
+        states.
+
+    '''
+
+    if seed is None and n_jobs != 1:
+        seed = np.random.randint(0, 2**31);
+
+    return seed
+
+def _parallel_map(function, args, n_jobs):
+    '''Apply a function to each element of a list of arguments.
+
+    Parameters
+    ----------
+    function : function
+        Module level function taking a single argument.
+    args : list
+        Arguments for which to evaluate the function.
+    n_jobs : int
+        Number of processes in which to evaluate the function.  1 evaluates
+        the function in the current process and -1 uses all available cpus.
+
+    Returns
+    -------
+    results : list
+        Results of the function, in the order of args.
+
+    '''
+
+    if n_jobs == 1 or len(args) <= 1:
+        return [function(arg) for arg in args];
+    if n_jobs < 1:
+        n_jobs = multiprocessing.cpu_count();
+    pool = multiprocessing.Pool(processes = min(n_jobs, len(args)));
+    try:
+        results = pool.map(function, args);
+    finally:
+        pool.close();
+        pool.join();
+
+    return results
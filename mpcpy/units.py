@@ -6,11 +6,24 @@ documentation on ``variables`` for more information.
 """
 
 from abc import ABCMeta, abstractmethod
+import inspect
 import numpy as np
 
 #%% Display unit abstract interface
+class _DisplayUnitMeta(ABCMeta):
+    '''Metaclass of the display units, which gives every display unit class 
+    empty ``__slots__`` unless it defines its own, so that display unit 
+    instances only hold their name.
+
+    '''
+
+    def __new__(mcs, name, bases, namespace):
+        namespace.setdefault('__slots__', ());
+        return super(_DisplayUnitMeta, mcs).__new__(mcs, name, bases, namespace);
+
 class _DisplayUnit(object):
-    __metaclass__ = ABCMeta; 
+    __metaclass__ = _DisplayUnitMeta; 
+    __slots__ = ('name',);
     @abstractmethod
     def _define_quantity(self):
         pass;
@@ -26,6 +39,10 @@ class _DisplayUnit(object):
     def __init__(self, variable):
         self._define_quantity(variable);
         self._define_display_unit();       
+    def __getstate__(self):
+        return {'name' : self.name};
+    def __setstate__(self, state):
+        self.name = state['name'];
 
 #%% Display unit quantity implementation
 class _Boolean(_DisplayUnit):
@@ -1044,4 +1061,223 @@ class kg_m3(_Density):
         return base_data;
     def _convert_from_base(self, base_data):
         display_data = base_data;
-        return display_data;
\ No newline at end of file
+        return display_data;
+
+#%% Affine conversion
+# Scale and offset of each display unit, such that 
+# base_data = scale*display_data + offset.  Boolean units are not affine.
+affine_coefficients = {K : (1.0, 0.0),
+                       degC : (1.0, 273.15),
+                       degF : (5.0/9, 273.15-32*5.0/9),
+                       degR : (5.0/9, 273.15-(459.67+32)*5.0/9),
+                       W : (1.0, 0.0),
+                       kW : (1e3, 0.0),
+                       MW : (1e6, 0.0),
+                       Btuh : (0.29307107, 0.0),
+                       kBtuh : (1e3*0.29307107, 0.0),
+                       hp : (745.699872, 0.0),
+                       J : (1.0, 0.0),
+                       kJ : (1e3, 0.0),
+                       MJ : (1e6, 0.0),
+                       Btu : (1055.05585, 0.0),
+                       kBtu : (1e3*1055.05585, 0.0),
+                       Wh : (3600.0, 0.0),
+                       kWh : (1e3*3600, 0.0),
+                       MWh : (1e6*3600, 0.0),
+                       W_m2 : (1.0, 0.0),
+                       kW_m2 : (1e3, 0.0),
+                       W_sf : (10.7639, 0.0),
+                       kW_sf : (1e3*10.7639, 0.0),
+                       Btuh_sf : (3.154594, 0.0),
+                       kBtuh_sf : (1e3*3.154594, 0.0),
+                       J_m2 : (1.0, 0.0),
+                       Wh_m2 : (3600.0, 0.0),
+                       kWh_m2 : (1e3*3600, 0.0),
+                       Wh_sf : (3600*10.7639, 0.0),
+                       kWh_sf : (1e3*3600*10.7639, 0.0),
+                       Btu_sf : (1055.05585*10.7639, 0.0),
+                       kBtu_sf : (1e3*1055.05585*10.7639, 0.0),
+                       Pa : (1.0, 0.0),
+                       kPa : (1e3, 0.0),
+                       MPa : (1e6, 0.0),
+                       bar : (1e5, 0.0),
+                       inwg : (248.84, 0.0),
+                       inHg : (3386.389, 0.0),
+                       psi : (6894.757, 0.0),
+                       atm : (101325.0, 0.0),
+                       unit1 : (1.0, 0.0),
+                       percent : (1/100.0, 0.0),
+                       unit10 : (1/10.0, 0.0),
+                       rad : (1.0, 0.0),
+                       deg : (np.pi/180, 0.0),
+                       s : (1.0, 0.0),
+                       minute : (60.0, 0.0),
+                       hour : (3600.0, 0.0),
+                       day : (86400.0, 0.0),
+                       kg : (1.0, 0.0),
+                       m : (1.0, 0.0),
+                       cm : (1/1e2, 0.0),
+                       mm : (1/1e3, 0.0),
+                       km : (1e3, 0.0),
+                       inch : (0.0254, 0.0),
+                       ft : (12*0.0254, 0.0),
+                       yd : (12*0.0254*3, 0.0),
+                       m2 : (1.0, 0.0),
+                       sf : (1/10.7639, 0.0),
+                       m3 : (1.0, 0.0),
+                       cf : (1/35.3147, 0.0),
+                       kg_s : (1.0, 0.0),
+                       m3_s : (1.0, 0.0),
+                       cfm : (1/2118.88, 0.0),
+                       m_s : (1.0, 0.0),
+                       mph : (0.44704, 0.0),
+                       km_h : (0.277778, 0.0),
+                       lx : (1.0, 0.0),
+                       fc : (10.764, 0.0),
+                       cd_m2 : (1.0, 0.0),
+                       nt : (1.0, 0.0),
+                       cents_kWh : (1.0, 0.0),
+                       dol_kWh : (100.0, 0.0),
+                       dol_MWh : (100/1000.0, 0.0),
+                       cents_kW : (1.0, 0.0),
+                       dol_kW : (100.0, 0.0),
+                       dol_MW : (100/1000.0, 0.0),
+                       J_kgK : (1.0, 0.0),
+                       J_K : (1.0, 0.0),
+                       J_m2K : (1.0, 0.0),
+                       K_W : (1.0, 0.0),
+                       m2K_W : (1.0, 0.0),
+                       W_m2K : (1.0, 0.0),
+                       kg_m3 : (1.0, 0.0)};
+
+def get_affine_coefficients(from_unit, to_unit):
+    '''Get the scale and offset converting data from one display unit to 
+    another of the same quantity.
+
+    Parameters
+    ----------
+    from_unit : mpcpy.units unit class
+        Display unit of the data.
+    to_unit : mpcpy.units unit class
+        Display unit to convert the data to.
+
+    Returns
+    -------
+    scale : float
+        Scale of the conversion.
+    offset : float
+        Offset of the conversion, such that 
+        to_data = scale*from_data + offset.
+
+    '''
+
+    if from_unit.__bases__[0] is not to_unit.__bases__[0]:
+        raise ValueError('Units {0} and {1} are not of the same quantity.'.format(from_unit.__name__, to_unit.__name__));
+    for unit in [from_unit, to_unit]:
+        if unit not in affine_coefficients:
+            raise ValueError('Unit {0} does not have an affine conversion.'.format(unit.__name__));
+    scale_from, offset_from = affine_coefficients[from_unit];
+    scale_to, offset_to = affine_coefficients[to_unit];
+    
+    return scale_from/scale_to, (offset_from-offset_to)/scale_to;
+
+def convert(data, from_unit, to_unit):
+    '''Convert data from one display unit to another of the same quantity.
+
+    The affine coefficients of both units are composed into a single scale 
+    and offset, so that the conversion is one multiply-add on the data, 
+    without going through the base unit.
+
+    Parameters
+    ----------
+    data : float, ``numpy`` array, ``pandas`` Series or DataFrame
+        Data in from_unit.
+    from_unit : mpcpy.units unit class
+        Display unit of the data.
+    to_unit : mpcpy.units unit class
+        Display unit to convert the data to.
+
+    Returns
+    -------
+    data : float, ``numpy`` array, ``pandas`` Series or DataFrame
+        Data in to_unit.
+
+    '''
+
+    scale, offset = get_affine_coefficients(from_unit, to_unit);
+
+    return data*scale + offset;
+
+
+#%% Unit registry
+class _UnitQuery(object):
+    '''Placeholder variable on which a unit defines its quantity.
+
+    '''
+
+    pass;
+
+def _build_unit_registry():
+    '''Index the display unit classes of the module by unit string and 
+    their quantity by unit class, once at import.
+
+    Classes are visited in order of name, so that a unit string shared by 
+    several classes maps to the first one.
+
+    '''
+
+    registry = {};
+    quantities = {};
+    module_items = globals();
+    for name in sorted(module_items.keys()):
+        unit = module_items[name];
+        if inspect.isclass(unit) and issubclass(unit, _DisplayUnit) and not inspect.isabstract(unit):
+            query = _UnitQuery();
+            display_unit = unit(query);
+            registry.setdefault(display_unit.name, unit);
+            quantities[unit] = (query.quantity_name, query.base_unit);
+
+    return registry, quantities;
+
+# Display unit class of each unit string and (quantity name, base unit class) 
+# of each display unit class
+unit_registry, unit_quantities = _build_unit_registry();
+
+def get_unit_class(unit_string):
+    '''Get the display unit class of a unit string.
+
+    Parameters
+    ----------
+    unit_string : string
+        Unit string, the name of the display unit.  For example, the unit 
+        string for a heat transfer coefficient in SI units is 
+        ``'W/(m2.K)'``.
+
+    Returns
+    -------
+    unit_class : mpcpy.units unit class
+        The display unit class, or an empty list if no unit has the unit 
+        string.
+
+    '''
+
+    return unit_registry.get(unit_string, []);
+
+def get_quantity(unit_class):
+    '''Get the quantity of a display unit class.
+
+    Parameters
+    ----------
+    unit_class : mpcpy.units unit class
+        Display unit class.
+
+    Returns
+    -------
+    quantity_name : string
+        Quantity name of the unit, e.g. ``'Temperature'``.
+    base_unit : mpcpy.units unit class
+        Base unit class of the quantity.
+
+    '''
+
+    return unit_quantities[unit_class];
@@ -24,7 +24,6 @@ import pandas as pd
 from pyfmi.common import core
 from pyfmi.common import xmlparser
 import shutil
-import inspect
 from mpcpy import variables
 from mpcpy import units
 from tzwhere import tzwhere
@@ -60,6 +59,20 @@ class _mpcpyPandas(object):
         
         '''
         
+        if not display_data and mpcpy_ts_list:
+            block = getattr(mpcpy_ts_list[0], 'block', None);
+            if block is not None and all(getattr(mpcpy_ts, 'block', None) is block for mpcpy_ts in mpcpy_ts_list):
+                # Columns of one block share an index, so take them 
+                # directly instead of aligning each timeseries.  Look the 
+                # columns up by view, since views may have been renamed.
+                mpcpy_ts_list = sorted(mpcpy_ts_list, key = lambda mpcpy_ts: mpcpy_ts.name);
+                columns = [mpcpy_ts._block_column for mpcpy_ts in mpcpy_ts_list];
+                names = [mpcpy_ts.name for mpcpy_ts in mpcpy_ts_list];
+                df = pd.DataFrame(block.array[:,columns], index = block.index, columns = names);
+                if df.isnull().values.any():
+                    df = df.interpolate(method='linear');
+                df.index.name = 'Time';
+                return df
         d = {};
         for mpcpy_ts in mpcpy_ts_list:
             if display_data:
@@ -142,10 +155,8 @@ class _mpcpyPandas(object):
         '''
         
         df = df.loc[index_start:]
-        t = df.index.to_series();
-        dt = t - t[0];
-        dt = dt.apply(lambda x: x / np.timedelta64(1, 's'));
-        dt.name = 'SimTime';
+        t = df.index.asi8;
+        dt = pd.Series((t - t[0]) / 1e9, index = df.index, name = 'SimTime');
         df_simtime = df.join(dt)
         
         return df_simtime
@@ -585,16 +596,7 @@ class _FMU(_mpcpyPandas):
         
         '''
         
-        unit_class_items = inspect.getmembers(units);
-        unit_class = [];
-        for unit_class_item in unit_class_items:
-            try:
-                temp_var = variables.Static('tempvar', 1, unit_class_item[1]);   
-                if fmu_variable_units[variable_name] == temp_var.get_display_unit_name():
-                    unit_class = unit_class_item[1];
-                    break
-            except:
-                continue
+        unit_class = units.get_unit_class(fmu_variable_units[variable_name]);
             
         return unit_class
         
@@ -908,15 +910,6 @@ def get_unit_class_from_unit_string(unit_string):
     
     '''
 
-    unit_class_items = inspect.getmembers(units);
-    unit_class = [];
-    for unit_class_item in unit_class_items:
-        try:
-            temp_var = variables.Static('tempvar', 1, unit_class_item[1]);   
-            if unit_string == temp_var.get_display_unit_name():
-                unit_class = unit_class_item[1];
-                break
-        except:
-            continue
+    unit_class = units.get_unit_class(unit_string);
 
     return unit_class
\ No newline at end of file
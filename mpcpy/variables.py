@@ -45,11 +45,19 @@ Classes
               get_base_unit, set_display_unit, get_display_unit_name, 
               get_base_unit_name, cleaning_replace
 
+.. autoclass:: mpcpy.variables.RegularTimeseries
+    :members: set_data, window, get_simtime
+
+.. autoclass:: mpcpy.variables.TimeseriesBlock
+    :members: keys, get_base_data, display_data, get_display_unit
+
 """
 
 from abc import ABCMeta, abstractmethod
 from tzwhere import tzwhere
 import numpy as np
+import pandas as pd
+from mpcpy import units
 
 #%% Variable abstract class
 class _Variable(object):
@@ -58,6 +66,10 @@ class _Variable(object):
     '''
 
     __metaclass__ = ABCMeta;
+    __slots__ = ();
+    
+    # Cache the data returned by display_data
+    cache_display = True;
     
     @abstractmethod
     def set_data(self,data):
@@ -95,9 +107,23 @@ class _Variable(object):
         Returns
         -------
         data : data object
-            Data object of the variable in display units.
+            Data object of the variable in display units.  Cached unless the 
+            cache_display attribute is False.
             
         '''
+        # Return the cached data of the display unit and timezone
+        if 'geography' in kwargs:
+            key = (type(self.display_unit), 'geography', tuple(kwargs['geography']));
+        elif 'tz_name' in kwargs:
+            key = (type(self.display_unit), 'tz_name', kwargs['tz_name']);
+        else:
+            key = (type(self.display_unit), None, None);
+        cache = getattr(self, '_display_cache', None);
+        if self.cache_display and cache is not None and key in cache:
+            self._timeseries, tz_name = cache[key];
+            if key[1] is not None:
+                self.tz_name = tz_name;
+            return self._timeseries;
         if type(self.data) is list:
             self._timeseries = [self.display_unit._convert_from_base(x) for x in self.data];
         else:
@@ -108,6 +134,11 @@ class _Variable(object):
         elif 'tz_name' in kwargs:
             self.tz_name = kwargs['tz_name'];
             self._timeseries = self._utc_to_local(self._timeseries);
+        if self.cache_display:
+            if cache is None:
+                cache = {};
+                self._display_cache = cache;
+            cache[key] = (self._timeseries, getattr(self, 'tz_name', None));
             
         return self._timeseries;
         
@@ -338,9 +369,20 @@ class Static(_Variable):
         Quantity type of the variable (e.g. Temperature, Power, etc.).        
     variability : string
         Static.
+    cache_display : boolean
+        True to cache the data returned by ``display_data()`` for each 
+        display unit and timezone until the data is set again.  The cached 
+        data is shared by the callers and should not be modified.  Set to 
+        False to convert the data on every call.
 
     '''
     
+    # Slots instead of a __dict__ keep the many Static variables of large 
+    # parameter sets compact
+    __slots__ = ('name', 'variability', 'display_unit', 'data', 'quantity_name', 
+                 'base_unit', 'cache_display', 'tz_name', 'tz', '_timeseries', 
+                 '_display_cache');
+
     def __init__(self, name, data, display_unit):
         '''Constructor of the Static variable object.
         
@@ -348,6 +390,7 @@ class Static(_Variable):
         
         self.name = name;
         self.variability = 'Static';
+        self.cache_display = True;
         self.display_unit = display_unit(self);
         self.set_data(data);
         
@@ -366,18 +409,44 @@ class Static(_Variable):
 
         '''
         
+        self._display_cache = None;
         if type(data) is float:
             self.data = self.display_unit._convert_to_base(float(data));
         elif type(data) is int: 
             self.data = self.display_unit._convert_to_base(float(data));
         elif type(data) is list:
-            self.data = [self.display_unit._convert_to_base(float(x)) for x in data];
+            if type(self.display_unit) in units.affine_coefficients:
+                # Convert all elements at once, unlike units that are not 
+                # affine, such as boolean units, which cast each element
+                self.data = self.display_unit._convert_to_base(np.array(data, dtype = np.float64)).tolist();
+            else:
+                self.data = [self.display_unit._convert_to_base(float(x)) for x in data];
         elif isinstance(data, np.ndarray):
-            self.data = np.array([self.display_unit._convert_to_base(float(x)) for x in data]);
+            if type(self.display_unit) in units.affine_coefficients:
+                # Convert all elements at once
+                self.data = self.display_unit._convert_to_base(data.astype(np.float64));
+            else:
+                self.data = np.array([self.display_unit._convert_to_base(float(x)) for x in data]);
         elif type(data) is str:
             raise TypeError('String data is not supported. Data must be numeric or list or numpy array of numerics.')
         else:
             self.data = self.display_unit._convert_to_base(data);
+
+    def __getstate__(self):
+        '''Return the set slots of the variable for pickling.
+
+        '''
+
+        return dict((slot, getattr(self, slot)) for slot in self.__slots__ if hasattr(self, slot));
+
+    def __setstate__(self, state):
+        '''Set the slots of the variable from a pickled state.
+
+        '''
+
+        self.cache_display = True;
+        for key, value in state.items():
+            setattr(self, key, value);
         
 class Timeseries(_Variable):
     '''Variable class with data that is a timeseries.
@@ -409,6 +478,13 @@ class Timeseries(_Variable):
         Quantity type of the variable (e.g. Temperature, Power, etc.).        
     variability : string
         Timeseries.
+    cache_display : boolean
+        True to cache the data returned by ``display_data()`` for each 
+        display unit and timezone until the data is set again.  The cached 
+        data is shared by the callers and should not be modified.  Set to 
+        False to convert the data on every call.
+    block : TimeseriesBlock or None
+        Block of which the variable is a column view, None otherwise.
 
     '''
     
@@ -443,6 +519,8 @@ class Timeseries(_Variable):
 
         '''
 
+        self._display_cache = None;
+        self.block = None;
         self._timeseries = timeseries;       
         if 'cleaning_type' in kwargs and kwargs['cleaning_type'] is not None:       
             cleaning_type = kwargs['cleaning_type'];
@@ -454,7 +532,7 @@ class Timeseries(_Variable):
         else:
             self.tz_name = tz_name;
             self._timeseries = self._local_to_utc(self._timeseries);
-        self.data = self.display_unit._convert_to_base(self._timeseries.apply(float));
+        self.data = self.display_unit._convert_to_base(self._timeseries.astype(np.float64));
         
     def cleaning_replace(self, (to_replace, replace_with)):
         '''Cleaning method to replace values within timeseries.
@@ -475,4 +553,454 @@ class Timeseries(_Variable):
 
         timeseries = self._timeseries.replace(to_replace,replace_with);
 
-        return timeseries           
\ No newline at end of file
+        return timeseries           
+
+
+class RegularTimeseries(Timeseries):
+    '''Class for timeseries variables on a regular time grid.
+
+    The data is stored as a start time, a time step and an array of values 
+    in base units.  The ``DatetimeIndex`` is only built when the data is 
+    requested as a ``pandas`` Series, so a regular timeseries can be used 
+    wherever a ``Timeseries`` is, while windows by time and simulation 
+    times are computed from the grid directly.
+
+    Parameters
+    ----------
+    name : string
+        Name of variable.
+    timeseries : ``pandas`` Series or ``numpy`` array
+        Timeseries data of variable.  A Series must have an index of 
+        timestamps with a constant step.  An array requires the start 
+        and step arguments.
+    display_unit : mpcpy.units.unit
+        Unit of variable data being set.
+    tz_name : string
+        Timezone name according to ``tzwhere``.
+    start : string or datetime, optional
+        Time of the first value of an array, in the timezone.
+    step : string or timedelta, optional
+        Time step between the values of an array, e.g. '1min'.
+    geography : list, optional
+        List specifying [latitude, longitude] in degrees.
+
+    Attributes
+    ----------
+    start : ``pandas`` Timestamp
+        UTC time of the first value.
+    step : ``pandas`` Timedelta
+        Time step between values.
+    values : ``numpy`` array
+        Data of the variable in base units.
+    index : ``pandas`` DatetimeIndex
+        UTC index of the data, built when first accessed.
+    data : ``pandas`` Series
+        Data of the variable in base units, built when first accessed.
+
+    '''
+
+    def set_data(self, timeseries, tz_name = 'UTC', **kwargs):
+        '''Set data of RegularTimeseries variable.
+
+        Parameters
+        ----------
+        timeseries : ``pandas`` Series or ``numpy`` array
+            Timeseries data of variable.  A Series must have an index of 
+            timestamps with a constant step.
+        tz_name : string
+            Timezone name according to ``tzwhere``.
+        start : string or datetime, optional
+            Time of the first value of an array, in the timezone.
+        step : string or timedelta, optional
+            Time step between the values of an array.
+        geography : list, optional
+            List specifying [latitude, longitude] in degrees.
+
+        Yields
+        ------
+        start, step, values : attributes
+            Regular grid of the data.
+
+        Raises
+        ------
+        ValueError
+            If the index of the Series does not have a constant step, or 
+            the start or step of an array is missing or the step is not 
+            positive.
+
+        '''
+
+        self._display_cache = None;
+        self.block = None;
+        self._index = None;
+        self._data = None;
+        if 'geography' in kwargs:
+            self._load_time_zone(kwargs['geography']);
+        else:
+            self.tz_name = tz_name;
+        if isinstance(timeseries, pd.Series):
+            if 'cleaning_type' in kwargs and kwargs['cleaning_type'] is not None:
+                self._timeseries = timeseries;
+                timeseries = kwargs['cleaning_type'](self, kwargs['cleaning_args']);
+            # Take the step in UTC, which is constant across daylight 
+            # saving time changes of the local time
+            timeseries = self._local_to_utc(timeseries);
+            start, step = self._get_grid(timeseries.index);
+            values = timeseries.values;
+        else:
+            if 'start' not in kwargs or 'step' not in kwargs:
+                raise ValueError('Start and step must be specified for regular timeseries array data.');
+            start = pd.Timestamp(kwargs['start']);
+            step = pd.Timedelta(kwargs['step']);
+            values = np.asarray(timeseries);
+        if step <= pd.Timedelta(0):
+            raise ValueError('Step of regular timeseries data must be positive.');
+        if start.tzinfo is None:
+            start = start.tz_localize(self.tz_name);
+        self.start = start.tz_convert('UTC');
+        self.step = step;
+        if type(self.display_unit) in units.affine_coefficients:
+            self.values = self.display_unit._convert_to_base(values.astype(np.float64));
+        else:
+            self.values = np.array([self.display_unit._convert_to_base(float(x)) for x in values]);
+        self._timeseries = None;
+
+    @property
+    def index(self):
+        '''UTC index of the data, built when first accessed.
+
+        '''
+
+        if self._index is None:
+            self._index = pd.date_range(self.start, periods = len(self.values), freq = self.step);
+
+        return self._index;
+
+    @property
+    def data(self):
+        '''Data of the variable in base units, built when first accessed.
+
+        '''
+
+        if self._data is None:
+            self._data = pd.Series(self.values, index = self.index, copy = False);
+
+        return self._data;
+
+    @data.setter
+    def data(self, data):
+        '''Set the data of the variable in base units.
+
+        Parameters
+        ----------
+        data : ``pandas`` Series
+            Data in base units.  Must have an index of timestamps with a 
+            constant step.
+
+        Raises
+        ------
+        ValueError
+            If the index of the Series does not have a constant step.
+
+        '''
+
+        index = data.index;
+        if index.tz is None:
+            index = index.tz_localize('UTC');
+        start, step = self._get_grid(index.tz_convert('UTC'));
+        if step <= pd.Timedelta(0):
+            raise ValueError('Step of regular timeseries data must be positive.');
+        self._display_cache = None;
+        self.block = None;
+        self._index = None;
+        self._data = None;
+        self.start = start.tz_convert('UTC');
+        self.step = step;
+        self.values = np.asarray(data.values, dtype = np.float64);
+
+    def window(self, start_time, final_time):
+        '''Return the part of the variable between two times.
+
+        The window is found from the grid without building the index and 
+        its values are a view of the values of the variable.
+
+        Parameters
+        ----------
+        start_time : string or datetime
+            First time of the window, inclusive, in the timezone of the 
+            variable if not timezone aware.
+        final_time : string or datetime
+            Last time of the window, inclusive, in the timezone of the 
+            variable if not timezone aware.
+
+        Returns
+        -------
+        variable : RegularTimeseries
+            Variable with the values of the window.
+
+        '''
+
+        n = len(self.values);
+        i_start = max(0, min(n, -(-self._grid_offset(start_time) // self.step.value)));
+        i_final = max(i_start, min(n, self._grid_offset(final_time) // self.step.value + 1));
+        variable = RegularTimeseries.__new__(RegularTimeseries);
+        variable.__dict__.update(self.__dict__);
+        variable._display_cache = None;
+        variable._index = None;
+        variable._data = None;
+        variable.start = self.start + i_start*self.step;
+        variable.values = self.values[i_start:i_final];
+
+        return variable;
+
+    def get_simtime(self, index_start = None):
+        '''Return the simulation time of each value.
+
+        Parameters
+        ----------
+        index_start : string or datetime, optional
+            Time which corresponds to simulation time of 0.  The start of 
+            the variable by default.
+
+        Returns
+        -------
+        simtime : ``numpy`` array
+            Simulation time of each value in seconds.
+
+        '''
+
+        step_seconds = self.step.value / 1e9;
+        simtime = np.arange(len(self.values))*step_seconds;
+        if index_start is not None:
+            simtime = simtime + self._grid_offset(index_start) / -1e9;
+
+        return simtime;
+
+    def _get_grid(self, index):
+        '''Return the start and step of an index with a constant step.
+
+        '''
+
+        if len(index) < 2:
+            raise ValueError('Regular timeseries data needs at least two timestamps to define the step.');
+        steps = np.diff(index.asi8);
+        if np.any(steps != steps[0]):
+            raise ValueError('Timestamps of regular timeseries data must have a constant step.');
+
+        return index[0], pd.Timedelta(int(steps[0]), unit = 'ns')
+
+    def _grid_offset(self, time):
+        '''Return the time after the start of the variable in nanoseconds.
+
+        '''
+
+        time = pd.Timestamp(time);
+        if time.tzinfo is None:
+            time = time.tz_localize(self.tz_name);
+
+        return time.tz_convert('UTC').value - self.start.value;
+
+class TimeseriesBlock(object):
+    '''Container of many timeseries variables with the same index.
+
+    The data of all variables is stored in base units as one 2D float64 
+    array with a shared index, instead of one series and index per 
+    variable.  Each variable is available as a ``Timeseries`` view of its 
+    column, so that a block can be used like a dictionary of timeseries 
+    variables, e.g. as measurement or exodata dictionaries.  Timeseries 
+    views of the same block are combined without aligning their indices.
+
+    Parameters
+    ----------
+    data : ``pandas`` DataFrame
+        Data of the variables in display units, with one column per 
+        variable.  Must have an index of timestamps.
+    display_units : mpcpy.units.unit or dictionary
+        Unit of all variables, or dictionary with the unit of each column.
+    tz_name : string
+        Timezone name according to ``tzwhere``.
+    geography : list, optional
+        List specifying [latitude, longitude] in degrees.
+
+    Attributes
+    ----------
+    index : ``pandas`` DatetimeIndex
+        UTC index shared by all variables.
+    array : ``numpy`` array
+        Data of the variables in base units, with one column per variable.
+    tz_name : string
+        Timezone name.
+
+    '''
+
+    def __init__(self, data, display_units, tz_name = 'UTC', **kwargs):
+        '''Constructor of the timeseries block object.
+
+        '''
+
+        if 'geography' in kwargs:
+            tz = tzwhere.tzwhere();
+            tz_name = tz.tzNameAt(kwargs['geography'][0], kwargs['geography'][1]);
+        self.tz_name = tz_name;
+        # Shared UTC index
+        index = data.index;
+        if index.tz is None:
+            index = index.tz_localize(tz_name);
+        self.index = index.tz_convert('UTC');
+        # Store the columns contiguously so that views of a column do not 
+        # copy it
+        self._columns = [str(column) for column in data.columns];
+        self.array = np.empty((len(self.index), len(self._columns)), dtype = np.float64, order = 'F');
+        self._views = {};
+        for j in range(len(self._columns)):
+            name = self._columns[j];
+            if isinstance(display_units, dict):
+                display_unit = display_units[data.columns[j]];
+            else:
+                display_unit = display_units;
+            view = Timeseries.__new__(Timeseries);
+            view.variability = 'Timeseries';
+            view.display_unit = display_unit(view);
+            view.name = name;
+            view.tz_name = tz_name;
+            view._display_cache = None;
+            column = data.iloc[:,j].values;
+            if display_unit in units.affine_coefficients:
+                self.array[:,j] = view.display_unit._convert_to_base(column.astype(np.float64));
+            else:
+                self.array[:,j] = [view.display_unit._convert_to_base(float(x)) for x in column];
+            view.data = pd.Series(self.array[:,j], index = self.index, copy = False);
+            view._timeseries = view.data;
+            view.block = self;
+            view._block_column = j;
+            self._views[name] = view;
+
+    def keys(self):
+        '''Returns the names of the variables of the block.
+
+        Returns
+        -------
+        keys : list
+            Names of the variables, in column order.
+
+        '''
+
+        return list(self._columns);
+
+    def values(self):
+        '''Returns the timeseries views of the variables of the block.
+
+        Returns
+        -------
+        values : list
+            Timeseries views of the variables, in column order.
+
+        '''
+
+        return [self._views[name] for name in self._columns];
+
+    def items(self):
+        '''Returns the names and timeseries views of the variables of the 
+        block.
+
+        Returns
+        -------
+        items : list
+            (name, view) tuples of the variables, in column order.
+
+        '''
+
+        return [(name, self._views[name]) for name in self._columns];
+
+    def __getitem__(self, name):
+        '''Returns the timeseries view of a variable of the block.
+
+        '''
+
+        return self._views[name];
+
+    def __contains__(self, name):
+        return name in self._views;
+
+    def __iter__(self):
+        return iter(self._columns);
+
+    def __len__(self):
+        return len(self._columns);
+
+    def get_base_data(self, names = None):
+        '''Return the data of variables of the block in base units.
+
+        Parameters
+        ----------
+        names : list, optional
+            Names of the variables.  All variables by default.
+
+        Returns
+        -------
+        data : ``pandas`` DataFrame
+            Data in base units with one column per variable.
+
+        '''
+
+        if names is None:
+            names = self._columns;
+        columns = [self._views[name]._block_column for name in names];
+
+        return pd.DataFrame(self.array[:,columns], index = self.index, columns = names);
+
+    def display_data(self, **kwargs):
+        '''Return the data of all variables of the block in display units.
+
+        Parameters
+        ----------
+        geography : list, optional
+            Latitude [0] and longitude [1] in degrees.  Will return 
+            the index in specified timezone.
+        tz_name : string, optional
+            Time zone name according to ``tzwhere`` package.  Will return 
+            the index in specified timezone.
+
+        Returns
+        -------
+        data : ``pandas`` DataFrame
+            Data in display units with one column per variable.
+
+        '''
+
+        if 'geography' in kwargs:
+            tz = tzwhere.tzwhere();
+            tz_name = tz.tzNameAt(kwargs['geography'][0], kwargs['geography'][1]);
+        elif 'tz_name' in kwargs:
+            tz_name = kwargs['tz_name'];
+        else:
+            tz_name = None;
+        values = np.empty(self.array.shape, dtype = np.float64);
+        for j in range(len(self._columns)):
+            display_unit = self._views[self._columns[j]].display_unit;
+            if type(display_unit) in units.affine_coefficients:
+                values[:,j] = display_unit._convert_from_base(self.array[:,j]);
+            else:
+                values[:,j] = [display_unit._convert_from_base(x) for x in self.array[:,j]];
+        df = pd.DataFrame(values, index = self.index, columns = self._columns);
+        if tz_name is not None:
+            df = df.tz_convert(tz_name);
+
+        return df;
+
+    def get_display_unit(self, name):
+        '''Returns the display unit of a variable of the block.
+
+        Parameters
+        ----------
+        name : string
+            Name of the variable.
+
+        Returns
+        -------
+        display_unit : mpcpy.units.unit
+            Display unit of variable.
+
+        '''
+
+        return type(self._views[name].display_unit);
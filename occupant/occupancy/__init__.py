@@ -11,4 +11,9 @@ Queueing
 
 .. automodule:: occupant.occupancy.queueing
 
+Markov Chain
+------------
+
+.. automodule:: occupant.occupancy.markov
+
 """
\ No newline at end of file
@@ -0,0 +1,11 @@
+#
+"""
+Occupancy count modeled as an inhomogeneous Markov chain over the 
+measurement points of a day.  The count at the next point of the day only 
+depends on the count at the current point, through a transition matrix 
+estimated for each point of the day.  Predicted distributions are 
+propagated with matrix products, without event-driven simulation, which 
+makes the model a cheap alternative to the queueing approach for small 
+spaces with few occupants.
+
+"""
@@ -0,0 +1,137 @@
+from __future__ import division
+import numpy as np
+
+
+def count_states(data, n_states):
+    # Occupancy states of the data, the counts rounded to integers and
+    # clipped to the largest state
+    # Inputs: data - data (np array), one row per day
+    #         n_states - the number of states, from zero occupants to
+    #                    n_states-1 occupants
+    # Output: states - integer np array of the shape of data
+
+    data = np.asarray(data, dtype=float)
+    if np.any(data < 0):
+        raise ValueError('negative occupancy')
+
+    return np.clip(np.rint(data), 0, n_states-1).astype(int)
+
+
+def transition_counts(data, n_states):
+    # Count the transitions between states at each point of the day over all
+    # days of the data at once
+    # Inputs: data - data (np array), one row per day
+    #         n_states - see count_states
+    # Outputs: initial - number of days starting in each state, np array of
+    #          length n_states
+    #          counts - counts[t,i,j] is the number of transitions from state
+    #          i at point t to state j at point t+1, np array of shape
+    #          (points-1, n_states, n_states)
+
+    states = count_states(np.atleast_2d(data), n_states)
+    points = states.shape[1]
+    initial = np.bincount(states[:,0], minlength=n_states)
+    flat = (np.arange(points-1)*n_states + states[:,:-1])*n_states + states[:,1:]
+    counts = np.bincount(flat.ravel(), minlength=(points-1)*n_states**2)
+
+    return initial, counts.reshape((points-1, n_states, n_states))
+
+
+def transition_matrices(initial, counts):
+    # Maximum likelihood initial distribution and transition matrices of the
+    # chain from its transition counts
+    # States never observed at a point of the day stay in the same state, and
+    # the chain starts empty if no day was observed.
+    # Inputs: initial, counts - see transition_counts
+    # Outputs: p0 - initial distribution, np array of length n_states
+    #          transition - transition[t] is the transition matrix from point
+    #          t to point t+1, rows summing to one
+
+    initial = np.asarray(initial, dtype=float)
+    counts = np.asarray(counts, dtype=float)
+    n_states = initial.size
+    if initial.sum() > 0:
+        p0 = initial/initial.sum()
+    else:
+        p0 = np.zeros((n_states,))
+        p0[0] = 1
+    total = counts.sum(axis=2, keepdims=True)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        transition = np.where(total > 0, counts/total, np.eye(n_states)[np.newaxis,:,:])
+
+    return p0, transition
+
+
+def propagate_distribution(p0, transition):
+    # Distribution of the state at each point of the day
+    # Inputs: p0, transition - see transition_matrices
+    # Output: dist - dist[t,i] is the probability of state i at point t, np
+    #         array of shape (points, n_states)
+
+    points = transition.shape[0]+1
+    dist = np.empty((points, p0.size))
+    dist[0] = p0
+    for t in range(points-1):
+        dist[t+1] = np.dot(dist[t], transition[t])
+
+    return dist
+
+
+def simulate_markov_chain_batch(p0, transition, n_iter, random_state=None):
+    # Simulate many independent realizations of the chain at once
+    # Inputs: p0, transition - see transition_matrices
+    #         n_iter - the number of realizations to simulate
+    #         random_state - numpy RandomState to draw from, the global numpy
+    #                        random state if not given
+    # Output: states - state at each point of the day of each realization, an
+    #         integer np array of shape (points, n_iter)
+
+    if random_state is None:
+        random_state = np.random
+    points = transition.shape[0]+1
+    n_states = p0.size
+    # the next state is the first one whose cumulative probability exceeds a
+    # uniform draw, clipped against round-off in the cumulative sums
+    cdf0 = np.cumsum(p0)
+    cdf = np.cumsum(transition, axis=2)
+    u = random_state.uniform(0, 1, (points, n_iter))
+    states = np.empty((points, n_iter), dtype=int)
+    states[0] = np.minimum(np.sum(u[0][:,np.newaxis] >= cdf0[np.newaxis,:], axis=1), n_states-1)
+    for t in range(points-1):
+        states[t+1] = np.minimum(np.sum(u[t+1][:,np.newaxis] >= cdf[t,states[t],:], axis=1), n_states-1)
+
+    return states
+
+
+def empirical_distribution(states, n_states):
+    # Distribution of the state at each point of the day over realizations
+    # Inputs: states - see simulate_markov_chain_batch
+    #         n_states - the number of states
+    # Output: dist - see propagate_distribution
+
+    points, n_iter = states.shape
+    flat = np.arange(points)[:,np.newaxis]*n_states + states
+    counts = np.bincount(flat.ravel(), minlength=points*n_states)
+
+    return counts.reshape((points, n_states))/n_iter
+
+
+def distribution_statistics(dist, quantiles=()):
+    # Mean, standard deviation and quantiles of the occupancy at each point
+    # of the day, the occupancy of state i being i
+    # Inputs: dist - see propagate_distribution
+    #         quantiles - the probabilities of the quantiles, in (0, 1)
+    # Outputs: mean, std - np arrays of length points
+    #          quantile - the smallest occupancies whose cumulative
+    #          probability reaches the probabilities, a np array with one row
+    #          per probability in quantiles
+
+    occ = np.arange(dist.shape[1])
+    mean = np.dot(dist, occ)
+    var = np.dot(dist, occ**2) - mean**2
+    std = np.sqrt(np.clip(var, 0, None))
+    cdf = np.cumsum(dist, axis=1)
+    quantiles = np.asarray(quantiles, dtype=float)
+    quantile = np.sum(cdf[np.newaxis,:,:] < quantiles[:,np.newaxis,np.newaxis]-1e-12, axis=2)
+
+    return mean, std, quantile.astype(float)
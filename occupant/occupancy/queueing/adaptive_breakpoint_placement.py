@@ -2,14 +2,23 @@
 from __future__ import division
 import numpy as np
 import random as rd
-from simulate_queue import simulate_queue
-from interp1 import interp1
-from parameter_inference import param_inference
-from unique_last import unique_last
-import matplotlib.pyplot as plt
-
-
-def adaptive_breakpoint_placement(data, res, margin, n_max):
+from simulate_queue import simulate_queue_batch
+from occupancy_moments import occupancy_moments
+from parameter_inference import param_inference_cumulative_counts, param_inference_from_counts
+
+
+def adaptive_breakpoint_placement(data, res, margin, n_max, score_method='monte_carlo', random_state=None):
+    # Inputs: data - training data (np array), one row per day
+    #         res - resolution of the grid search for the breakpoints
+    #         margin - minimum distance between two adjacent breakpoints
+    #         n_max - upper limit of the number of breakpoints
+    #         score_method - 'monte_carlo' to score the candidate breakpoints
+    #                        with the mean of a Monte Carlo simulation of the
+    #                        queue or 'analytic' to score them with the
+    #                        analytic mean of the queue
+    #         random_state - numpy RandomState to draw from, the global
+    #                        numpy and python random states if not given
+    # Output: seg_point - list of breakpoints
     n = 1
     valSize, l = data.shape
     seg_point = []
@@ -20,8 +29,11 @@ def adaptive_breakpoint_placement(data, res, margin, n_max):
     iter_num = 10
     flag = 1
 
+    # cumulative counts of the training data, from which the parameters of
+    # every candidate segment are inferred
+    arr_cum, dep_cum, queue_cum = param_inference_cumulative_counts(data)
+
     while n < n_max:
-        print n
         # if the stack is empty, then break
         if len(stack) == 0 & flag == 0:
             break
@@ -45,112 +57,55 @@ def adaptive_breakpoint_placement(data, res, margin, n_max):
 
         ind_vec = np.arange(a, b, res)
         ind_length = ind_vec.size
-        err_vec = np.empty(ind_length,) # fitting error of each breakpoint
-        err_vec[:] = np.NAN
-        err_1 = np.empty(ind_length,) # fitting error of the first segment
-        err_1[:] = np.NAN
-        err_2 = np.empty(ind_length,) # fitting error of the second segment
-        err_2[:] = np.NAN
+        if ind_length == 0:
+            continue
 
+        # infer the parameters of the two segments of every candidate
+        # breakpoint (rows) for every training day (columns) at once
+        lambda_1, mu_1, lambda_2, mu_2 = _split_parameters(arr_cum, dep_cum, queue_cum, left, right, ind_vec, empty_time)
 
-        syssize_min = np.empty(ind_length,) # record the simulated time series with smallest fitting error
         lambda_mat = np.zeros((2,ind_length))
         mu_mat = np.zeros((2,ind_length))
+        lambda_mat[0,:] = np.mean(np.ascontiguousarray(lambda_1.T), axis=1)
+        lambda_mat[1,:] = np.mean(np.ascontiguousarray(lambda_2.T), axis=1)
+        mu_mat[0,:] = np.mean(np.ascontiguousarray(mu_1.T), axis=1)
+        mu_mat[1,:] = np.mean(np.ascontiguousarray(mu_2.T), axis=1)
+
+        # piecewise constant arrival and departure rates of every candidate
+        maxtime = right-left
+        time_int = np.arange(maxtime)
+        first = time_int[np.newaxis,:] < (ind_vec-left)[:,np.newaxis]
+        lam_cand = np.where(first, lambda_mat[0,:,np.newaxis], lambda_mat[1,:,np.newaxis])
+        mu_cand = np.where(first, mu_mat[0,:,np.newaxis], mu_mat[1,:,np.newaxis])
+
+        if right < empty_time:
+            empty_time_relative = None
+        else:
+            empty_time_relative = empty_time-left+1
 
-        for j in range(ind_length):
-            lambda_1_vec = []
-            lambda_2_vec = []
-            mu_1_vec = []
-            mu_2_vec = []
-
-            for i in range(valSize):
-                x = data[i,:]
-                if x[left:ind_vec[j]].size == 0:
-                    raise ValueError('x[left:ind_vec[j]].size == 0')
-                else:
-                    lambda_1,mu_1 = param_inference(x[left:ind_vec[j]], round((left+ind_vec[j])/2), empty_time)
-                if x[ind_vec[j]:right].size == 0:
-                    raise ValueError('x[ind_vec[j]:right].size == 0')
-                else:
-                    lambda_2, mu_2 = param_inference(x[ind_vec[j]:right], round((ind_vec[j] + 1 + right) / 2),
-                                                     empty_time)
-
-                lambda_1_vec.append(lambda_1)
-                lambda_2_vec.append(lambda_2)
-                mu_1_vec.append(mu_1)
-                mu_2_vec.append(mu_2)
-
-
-            lambda_mat[0,j] = np.mean(lambda_1_vec)
-            lambda_mat[1,j] = np.mean(lambda_2_vec)
-            mu_mat[0,j] = np.mean(mu_1_vec)
-            mu_mat[1,j] = np.mean(mu_2_vec)
-
-            seg_point_temp = np.array([left,ind_vec[j],right])-left
-            jmptimes_mc = [None]*iter_num # create an empty list of size iter_num
-            syssize_mc = np.empty((right-left,iter_num))
-            syssize_mc[:] = np.NAN
-            maxtime = right-left
-            lam = np.empty((maxtime,))
-            mu = np.empty((maxtime,))
-
-            for i in range(2):
-                lam[seg_point_temp[i]:seg_point_temp[i+1]] = lambda_mat[i,j]
-                mu[seg_point_temp[i]:seg_point_temp[i+1]] = mu_mat[i,j]
-
-            time_int = np.array(range(right-left))
-
-            if right < empty_time:
-                empty_time_relative = None
+        # mean simulated time series of every candidate, all candidates at once
+        if score_method == 'analytic':
+            if left == 0:
+                nstart = 0
             else:
-                empty_time_relative = empty_time-left+1
-
-            for iter_idx in range(iter_num):
-
-
-                if left == 0:
-                    nstart = 0
-                else:
-                    nstart = data[rd.randint(0,valSize-1),left-1]
-
-
-                jmptimes,syssize = simulate_queue(maxtime,lam,mu,nstart,empty_time_relative)
-
-
-
-                if jmptimes is None:
-                    jmptimes_mc[iter_idx] = 0
-                    syssize_mc[:,iter_idx] = nstart*np.ones((len(time_int),))
-                else:
-                    # round jmptimes to the nearest integer
-
-                    jmptimes_d, ia  = unique_last(np.round(jmptimes))
-                    syssize_d = syssize[ia]
-                    if jmptimes_d[0] != 0:
-                        jmptimes_int = np.insert(jmptimes_d,0,0)
-                        syssize_int =  np.insert(syssize_d,0,0)
-                    else:
-                        jmptimes_int = jmptimes_d
-                        syssize_int = syssize_d
-
-
-                    vq = interp1(jmptimes_int,syssize_int,time_int)
-                    jmptimes_mc[iter_idx] = jmptimes_d
-                    syssize_mc[:,iter_idx] = vq
-
-
-            err_vec[j] = np.linalg.norm(np.mean(syssize_mc,axis=1) \
-                                        - np.mean(data[:,left:right],axis=0) ,ord=2)
-
-            err_1[j] = np.linalg.norm(np.mean(syssize_mc[:ind_vec[j]-left,:],axis=1) \
-                                      - np.mean(data[:,left:ind_vec[j]],axis=0),ord=2)
-            err_2[j] = np.linalg.norm(np.mean(syssize_mc[ind_vec[j]-left:,:],axis=1) \
-                                      - np.mean(data[:,ind_vec[j]:right],axis=0),ord=2)
-
-            err_vec_min= min(err_vec[:j+1])
+                nstart = np.mean(data[:,left-1])
+            syssize_mean = occupancy_moments(maxtime, lam_cand, mu_cand, nstart, empty_time_relative)[0]
+        elif score_method == 'monte_carlo':
+            if left == 0:
+                nstart = np.zeros((ind_length, iter_num))
+            else:
+                nstart = data[_randint(random_state,0,valSize-1,(ind_length, iter_num)),left-1]
+            syssize_mc = simulate_queue_batch(maxtime, lam_cand, mu_cand, nstart, empty_time_relative, iter_num, random_state=random_state)
+            syssize_mean = np.mean(syssize_mc.reshape((maxtime, ind_length, iter_num)), axis=2).T
+        else:
+            raise ValueError('Unknown score_method {0}'.format(score_method))
 
-            if err_vec[j] == err_vec_min:
-                syssize_min = np.mean(syssize_mc,axis=1)
+        # fitting error of each breakpoint, of its first segment and of its
+        # second segment
+        sq_err = (syssize_mean - np.mean(data[:,left:right],axis=0))**2
+        err_vec = np.sqrt(np.sum(sq_err, axis=1))
+        err_1 = np.sqrt(np.sum(np.where(first, sq_err, 0), axis=1))
+        err_2 = np.sqrt(np.sum(np.where(first, 0, sq_err), axis=1))
 
 
 
@@ -170,7 +125,7 @@ def adaptive_breakpoint_placement(data, res, margin, n_max):
                 seg_point.append(empty_time)
             continue
 
-        min_ind = min_ind_vec[rd.randint(0,len(min_ind_vec)-1)]
+        min_ind = min_ind_vec[_randint(random_state,0,len(min_ind_vec)-1)]
 
 
 
@@ -192,16 +147,117 @@ def adaptive_breakpoint_placement(data, res, margin, n_max):
 
 
         n += 1
-        print n
-
-        # x_mean = np.mean(data,axis=0)
 
-        # fig = plt.figure()
-        # plt.plot(x_mean)
-        # plt.scatter(seg_point, x_mean[seg_point], s=20, color='red')
-        # plt.plot(np.arange(left,right),syssize_min)
-        # plt.show()
-        #
-        # plt.close(fig)
     return seg_point
 
+
+def coarse_to_fine_breakpoint_placement(data, res, margin, n_max, factor, score_method='monte_carlo', random_state=None):
+    # Multi-resolution adaptive breakpoint placement for high resolution data
+    # The breakpoints are placed on the data downsampled by factor, with res
+    # and margin scaled accordingly, and then each breakpoint is refined at
+    # full resolution within factor samples of its coarse location
+    # Inputs: data - training data (np array), one row per day
+    #         res - resolution of the grid search for the breakpoints
+    #         margin - minimum distance between two adjacent breakpoints
+    #         n_max - upper limit of the number of breakpoints
+    #         factor - downsampling factor, 1 to place the breakpoints at full
+    #                  resolution with adaptive_breakpoint_placement
+    #         score_method, random_state - scoring of the candidate
+    #                        breakpoints on the downsampled data, see
+    #                        adaptive_breakpoint_placement
+    # Output: seg_point - list of breakpoints
+    if factor <= 1:
+        return adaptive_breakpoint_placement(data, res, margin, n_max, score_method, random_state)
+
+    l = data.shape[1]
+    presence = np.where(np.mean(data, axis = 0)!=0)
+    empty_time = presence[0][-1]+1
+
+    # place the breakpoints on the downsampled data
+    data_coarse = data[:,::factor]
+    presence_coarse = np.where(np.mean(data_coarse, axis = 0)!=0)
+    # sparse occupancy may be missed by the downsampling altogether, in which
+    # case the breakpoints are placed at full resolution
+    if presence_coarse[0].size == 0:
+        return adaptive_breakpoint_placement(data, res, margin, n_max, score_method, random_state)
+    empty_time_coarse = presence_coarse[0][-1]+1
+    res_coarse = max(1, int(np.floor(res/factor + 0.5)))
+    margin_coarse = max(1, int(np.ceil(margin/factor)))
+    seg_coarse = adaptive_breakpoint_placement(data_coarse, res_coarse, margin_coarse, n_max, score_method, random_state)
+
+    # scale the breakpoints back to full resolution, where the breakpoint at
+    # the coarse empty time is the empty time
+    seg_point = sorted(set([empty_time if point == empty_time_coarse else point*factor for point in seg_coarse]))
+
+    # refine each breakpoint between its refined left neighbour and its right
+    # neighbour, keeping the empty time as it is
+    arr_cum, dep_cum, queue_cum = param_inference_cumulative_counts(data)
+    data_mean = np.mean(data, axis=0)
+    seg_fine = []
+    for i in range(len(seg_point)):
+        point = seg_point[i]
+        left = seg_fine[-1] if seg_fine else 0
+        right = seg_point[i+1] if i+1 < len(seg_point) else l
+        if point != empty_time:
+            ind_vec = np.arange(max(point-factor+1, left+margin), min(point+factor, right-margin))
+            # drop the breakpoint if it cannot be placed with the margin
+            if ind_vec.size == 0:
+                continue
+            point = _refine_breakpoint(data, data_mean, arr_cum, dep_cum, queue_cum, left, right, ind_vec, empty_time)
+        seg_fine.append(point)
+
+    return seg_fine
+
+
+def _refine_breakpoint(data, data_mean, arr_cum, dep_cum, queue_cum, left, right, ind_vec, empty_time):
+    # Select the breakpoint among the candidates ind_vec that best fits the
+    # mean data of the segment between left and right, with the analytic mean
+    # occupancy of the queue of the two resulting segments
+    # Output: the selected breakpoint
+    lambda_1, mu_1, lambda_2, mu_2 = _split_parameters(arr_cum, dep_cum, queue_cum, left, right, ind_vec, empty_time)
+
+    maxtime = right-left
+    time_int = np.arange(maxtime)
+    first = time_int[np.newaxis,:] < (ind_vec-left)[:,np.newaxis]
+    lam_cand = np.where(first, np.mean(lambda_1, axis=0)[:,np.newaxis], np.mean(lambda_2, axis=0)[:,np.newaxis])
+    mu_cand = np.where(first, np.mean(mu_1, axis=0)[:,np.newaxis], np.mean(mu_2, axis=0)[:,np.newaxis])
+
+    if right < empty_time:
+        empty_time_relative = None
+    else:
+        empty_time_relative = empty_time-left+1
+    if left == 0:
+        nstart = 0
+    else:
+        nstart = np.mean(data[:,left-1])
+
+    syssize_mean = occupancy_moments(maxtime, lam_cand, mu_cand, nstart, empty_time_relative)[0]
+    err_vec = np.linalg.norm(syssize_mean - data_mean[left:right], axis=1)
+
+    return ind_vec[np.argmin(err_vec)]
+
+
+def _split_parameters(arr_cum, dep_cum, queue_cum, left, right, ind_vec, empty_time):
+    # Infer the parameters of the two segments, between left and each
+    # candidate breakpoint of ind_vec and between the breakpoint and right,
+    # for every candidate (rows) and training day (columns), splitting each
+    # segment at its middle
+    # Output: lambda_1, mu_1, lambda_2, mu_2 - parameters of the first and of
+    #         the second segments
+    h_1 = np.floor((left+ind_vec)/2 + 0.5)
+    h_2 = np.floor((ind_vec+1+right)/2 + 0.5)
+    lambda_1, mu_1 = param_inference_from_counts(arr_cum, dep_cum, queue_cum, left, ind_vec, h_1, empty_time)
+    lambda_2, mu_2 = param_inference_from_counts(arr_cum, dep_cum, queue_cum, ind_vec, right, h_2, empty_time)
+
+    return lambda_1, mu_1, lambda_2, mu_2
+
+
+def _randint(random_state, low, high, size=None):
+    # Random integer between low and high included, or array of random
+    # integers of the given size, drawn from random_state or from the global
+    # python random state if random_state is None
+    if random_state is None:
+        if size is None:
+            return rd.randint(low, high)
+        return np.array([rd.randint(low, high) for i in range(int(np.prod(size)))]).reshape(size)
+    return random_state.randint(low, high+1, size)
@@ -0,0 +1,95 @@
+# Benchmark of unique_last and interp1 against their original loop
+# implementations, on the jump times of simulated queues of one day at 1 minute
+# and 5 minute resolution
+# Run from this directory: python benchmark_unique_last_interp1.py
+from __future__ import division
+import timeit
+import numpy as np
+from simulate_queue import simulate_queue
+from unique_last import unique_last
+from interp1 import interp1
+
+
+def unique_last_loop(x):
+    # original implementation of unique_last, O(n^2)
+    C, ia, ic = np.unique(x,return_index=True,return_inverse=True)
+    ic_unique = np.unique(ic)
+    for i in range(len(ic_unique)):
+        ic_idx = np.where(ic == ic_unique[i])
+        ic_idx_last = ic_idx[0][-1]
+        ic_idx_first = ic_idx[0][0]
+        ia_idx = np.where(ia == ic_idx_first)
+        ia[ia_idx] = ic_idx_last
+    ia = np.sort(ia)
+    return C,ia
+
+
+def interp1_loop(x,v,xq):
+    # original implementation of interp1, O(n*m)
+    xv_comb = np.array([x,v])
+    xv_sorted = xv_comb[0:2,xv_comb[0,:].argsort()]
+    x_sorted = xv_sorted[0,:]
+    v_sorted = xv_sorted[1,:]
+    vq = np.empty(xq.size)
+    vq[:] = np.NAN
+    for i in range(len(x_sorted)):
+        if i == 0:
+            idx = np.where(xq <= x_sorted[0])[0]
+            if idx.size == 0:
+                continue
+            else:
+                vq[idx] = v_sorted[0]
+        else:
+            idx = np.where(np.logical_and(xq > x_sorted[i-1], xq <= x_sorted[i]))[0]
+            vq[idx] = v_sorted[i-1]
+
+    idx = np.where(np.logical_and(xq > x_sorted[-1], np.isnan(vq)))[0]
+    vq[idx] = v_sorted[-1]
+    return vq
+
+
+def jump_times(maxtime, n_iter):
+    # jump times and system sizes of simulated busy days, with arrivals during
+    # working hours
+    lam = np.zeros((maxtime,))
+    lam[int(maxtime*8/24):int(maxtime*18/24)] = 2*288/maxtime
+    mu = 0.05*288/maxtime*np.ones((maxtime,))
+    empty_time = int(maxtime*22/24)
+    samples = []
+    for iter_idx in range(n_iter):
+        jmptimes, syssize = simulate_queue(maxtime, lam, mu, 0, empty_time)
+        samples.append((jmptimes, syssize))
+    return samples
+
+
+def benchmark(maxtime, n_iter=20):
+    np.random.seed(1)
+    samples = jump_times(maxtime, n_iter)
+    time_int = np.arange(maxtime)
+    # inputs as in occupancy_prediction
+    inputs = []
+    for jmptimes, syssize in samples:
+        x = np.round(jmptimes)
+        jmptimes_d, ia = unique_last(x)
+        inputs.append((x, jmptimes_d, syssize[ia]))
+
+    # check the results are identical
+    for x, jmptimes_d, syssize_d in inputs:
+        for new, old in zip(unique_last(x), unique_last_loop(x)):
+            assert np.array_equal(new, old)
+        assert np.array_equal(interp1(jmptimes_d, syssize_d, time_int), interp1_loop(jmptimes_d, syssize_d, time_int))
+
+    n_jumps = np.mean([x.size for x, jmptimes_d, syssize_d in inputs])
+    print('maxtime {0}, {1:.0f} jumps per day on average'.format(maxtime, n_jumps))
+    for name, function, args in [('unique_last', unique_last, lambda x, j, s: (x,)),
+                                 ('unique_last_loop', unique_last_loop, lambda x, j, s: (x,)),
+                                 ('interp1', interp1, lambda x, j, s: (j, s, time_int)),
+                                 ('interp1_loop', interp1_loop, lambda x, j, s: (j, s, time_int))]:
+        run = lambda: [function(*args(*sample)) for sample in inputs]
+        seconds = min(timeit.repeat(run, number=1, repeat=3))/len(inputs)
+        print('  {0:<18} {1:10.3f} ms per day'.format(name, 1000*seconds))
+
+
+if __name__ == '__main__':
+    benchmark(288)
+    benchmark(1440)
@@ -0,0 +1,124 @@
+from __future__ import division
+import numpy as np
+from scipy.stats import poisson, binom
+from simulate_queue import cumulative_hazard
+
+
+def occupancy_moments(maxtime,lam,mu,nstart,empty_time,mu_cum=None):
+    # Function for computing the mean and variance of the queue system size in
+    # closed form, without Monte Carlo simulation
+    # The queue has infinitely many servers, so the customers present at a
+    # time step are the Poisson arrivals thinned by the probability that they
+    # have not departed yet, which makes the system size Poisson distributed.
+    # The customers initially in the system add a binomial term.
+    # The time steps follow the conventions of simulate_queue_batch.
+    # The cost is linear in maxtime, so that many rate profiles can be
+    # evaluated at once, e.g. to score candidate breakpoints.
+    # Inputs: maxtime - the time range for simulation
+    # lam - arrival rate (vector for nonhomogeneous queue), a numpy array, or
+    #       a numpy array with one row per rate profile
+    # mu - departure rate (vector for nonhomogeneous queue), a numpy array
+    #      with the same shape as lam
+    # nstart - the number of customers in the system at the beginning of simulation
+    # empty_time - the time when the queue system is known to have zero customer
+    # mu_cum - cumulative hazard of mu as returned by cumulative_hazard,
+    #          computed from mu if not given
+    # Outputs: mean, var - mean and variance of the system size at each integer
+    #          time step, numpy arrays of length maxtime, with one row per
+    #          rate profile if lam and mu have one row per profile
+
+    mean_arr, survival_start = _occupancy_components(maxtime,lam,mu,empty_time,mu_cum)
+    mean = mean_arr + nstart*survival_start
+    var = mean_arr + nstart*survival_start*(1-survival_start)
+
+    return mean, var
+
+
+def occupancy_quantiles(maxtime,lam,mu,nstart,empty_time,quantiles,mu_cum=None):
+    # Function for computing quantiles of the queue system size in closed form
+    # The system size is the sum of a Poisson distributed number of arrived
+    # customers and of a binomial number of customers initially in the system,
+    # see occupancy_moments.
+    # Inputs: maxtime, lam, mu, nstart, empty_time, mu_cum - see
+    #         occupancy_moments
+    # quantiles - the probabilities of the quantiles, in (0, 1)
+    # Output: quantile - quantiles of the system size at each integer time
+    #         step, a numpy array with one row per probability in quantiles
+
+    mean_arr, survival_start = _occupancy_components(maxtime,lam,mu,empty_time,mu_cum)
+    nstart = int(nstart)
+    # probability of each system size at each time step, over a support
+    # covering all but a negligible probability
+    size = np.arange(nstart + poisson.ppf(1-1e-12, np.max(mean_arr)) + 2)
+    pmf = poisson.pmf(size[:,np.newaxis], mean_arr[np.newaxis,:])
+    if nstart:
+        pmf_start = binom.pmf(size[:nstart+1,np.newaxis], nstart, survival_start[np.newaxis,:])
+        pmf = np.array([np.convolve(pmf[:,t], pmf_start[:,t])[:size.size] for t in range(maxtime)]).T
+    cdf = np.cumsum(pmf, axis=0)
+    # the quantile is the smallest system size with a cumulative probability
+    # reaching the probability of the quantile
+    quantiles = np.asarray(quantiles, dtype=float)
+    quantile = np.sum(cdf[np.newaxis,:,:] < quantiles[:,np.newaxis,np.newaxis]-1e-12, axis=1)
+
+    return quantile.astype(float)
+
+
+def _occupancy_components(maxtime,lam,mu,empty_time,mu_cum):
+    # Expected number of arrived customers in the system and probability that
+    # a customer initially in the system is still there, at each time step
+    # lam and mu may have one row per rate profile, in which case the
+    # components of all profiles are computed at once
+
+    if mu_cum is None:
+        mu_cum = cumulative_hazard(mu)
+    single = np.ndim(mu_cum) == 1
+    mu_cum = np.atleast_2d(mu_cum)
+    n_prof = mu_cum.shape[0]
+
+    # no arrivals are accepted after empty_time
+    arrivals = np.array(np.atleast_2d(lam)[:,:maxtime], dtype=float)
+    if empty_time is not None:
+        arrivals[:,empty_time:] = 0
+
+    # the probability that a customer arriving at time step k is still in the
+    # system at time step t>k is exp(-(mu_cum[t]-mu_cum[k])), or, with the
+    # service times truncated so that all customers depart before empty_time,
+    # exp(-(mu_cum[t]-mu_cum[k]))*(1-exp(-(mu_cum[trunc]-mu_cum[t])))/
+    # (1-exp(-(mu_cum[trunc]-mu_cum[k]))), in both cases a factor of k times
+    # a factor of t times exp(-(mu_cum[t]-mu_cum[k])), so that the expected
+    # number of customers at every time step follows from one recursion
+    if not empty_time:
+        weight = arrivals
+    else:
+        trunc_time = min(empty_time, mu_cum.shape[1]-1)
+        hazard_trunc = mu_cum[:,trunc_time,np.newaxis] - mu_cum[:,:maxtime]
+        # customers for which no departure is possible before empty_time stay
+        # until then
+        stay = hazard_trunc == 0
+        with np.errstate(divide='ignore', invalid='ignore', over='ignore'):
+            weight = np.where(stay, 0, arrivals/-np.expm1(-hazard_trunc))
+    decay = np.exp(-np.diff(mu_cum[:,:maxtime+1], axis=1))
+    arrived = np.zeros((n_prof, maxtime+1))
+    for t in range(maxtime):
+        arrived[:,t+1] = (arrived[:,t] + weight[:,t])*decay[:,t]
+    survival_start = np.exp(-mu_cum[:,:maxtime+1])
+    if empty_time:
+        # (the factor of t is only used before trunc_time)
+        factor = -np.expm1(np.minimum(mu_cum[:,:maxtime+1] - mu_cum[:,trunc_time,np.newaxis], 0))
+        inside = np.arange(maxtime+1) < trunc_time
+        arrived = np.where(inside, arrived*factor, 0)
+        arrived[:,1:] += np.cumsum(np.where(stay, arrivals, 0), axis=1)*inside[1:]
+        with np.errstate(divide='ignore', invalid='ignore', over='ignore'):
+            survival_start = np.where(stay[:,0,np.newaxis], 1, survival_start*factor/-np.expm1(-hazard_trunc[:,0,np.newaxis]))
+        survival_start = np.where(inside, survival_start, 0)
+
+    # the system size at time step t counts the customers that arrived before t
+    # and did not depart before t, except for the first time step, which has
+    # the same system size as the second one
+    times = np.maximum(np.arange(maxtime), 1)
+    mean_arr = arrived[:,times]
+    survival_start = survival_start[:,times]
+    if single:
+        return mean_arr[0], survival_start[0]
+
+    return mean_arr, survival_start
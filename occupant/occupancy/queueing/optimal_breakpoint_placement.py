@@ -0,0 +1,78 @@
+# Optimal breakpoint placement by penalized likelihood segmentation
+from __future__ import division
+import numpy as np
+
+
+def optimal_breakpoint_placement(data, margin, penalty=None):
+    # Place the breakpoints that minimize the penalized negative log-likelihood
+    # of the arrival and departure counts of the training data, modeled as
+    # Poisson processes with piecewise constant rates, with the Pruned Exact
+    # Linear Time (PELT) algorithm
+    # The space is empty after empty_time, which is always a breakpoint, so
+    # only the data before empty_time is segmented.
+    # Inputs: data - training data (np array), one row per day
+    #         margin - minimum distance between two adjacent breakpoints
+    #         penalty - penalty added for each segment, defaults to the
+    #                   Bayesian information criterion of the two rates of
+    #                   a segment, k/2*log(n) with k=2 on the scale of the
+    #                   negative log-likelihood
+    # Output: seg_point - list of breakpoints
+    valSize, l = data.shape
+    presence = np.where(np.mean(data, axis = 0)!=0)
+    empty_time = presence[0][-1]+1
+    margin = max(1, margin)
+    if penalty is None:
+        penalty = np.log(valSize*empty_time)
+
+    # cumulative counts before each time step, summed over the days, of the
+    # arrivals, of the departures and of the customers that may depart
+    jumps = np.diff(data, axis=1)
+    zero = np.zeros((1,))
+    arr_cum = np.concatenate((zero, zero, np.cumsum(np.sum(np.clip(jumps, 0, None), axis=0))))
+    dep_cum = np.concatenate((zero, zero, np.cumsum(np.sum(np.clip(-jumps, 0, None), axis=0))))
+    risk_cum = np.concatenate((zero, zero, np.cumsum(np.sum(data[:,:-1], axis=0))))
+
+    def cost(s, t):
+        # negative log-likelihood of the segments from s to t, without the
+        # terms that sum to a constant over any segmentation
+        return _poisson_cost(arr_cum[t]-arr_cum[s], valSize*(t-s)) + \
+               _poisson_cost(dep_cum[t]-dep_cum[s], risk_cum[t]-risk_cum[s])
+
+    # optimal cost of the data before each time step and last breakpoint of
+    # the corresponding segmentation
+    F = np.inf*np.ones((empty_time+1,))
+    F[0] = -penalty
+    last = np.zeros((empty_time+1,), dtype=int)
+    candidates = np.zeros((0,), dtype=int)
+    for t in range(margin, empty_time+1):
+        # segments are at least margin long
+        if t-margin == 0 or t-margin >= margin:
+            candidates = np.append(candidates, t-margin)
+        if candidates.size == 0:
+            continue
+        F_cand = F[candidates] + cost(candidates, t)
+        best = np.argmin(F_cand)
+        F[t] = F_cand[best] + penalty
+        last[t] = candidates[best]
+        # prune the candidates that cannot be the last breakpoint anymore
+        candidates = candidates[F_cand <= F[t]]
+
+    # backtrack the breakpoints of the optimal segmentation
+    seg_point = []
+    t = empty_time
+    while last[t] > 0:
+        t = last[t]
+        seg_point.insert(0, t)
+    if empty_time < l:
+        seg_point.append(empty_time)
+
+    return seg_point
+
+
+def _poisson_cost(count, exposure):
+    # Negative log-likelihood of Poisson counts at their maximum likelihood
+    # rate count/exposure, up to terms that do not depend on the segmentation
+    count = np.asarray(count, dtype=float)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        cost = -count*np.log(count/exposure)
+    return np.where(count > 0, cost, 0)
@@ -7,20 +7,13 @@ def param_inference(x,h,empty_time):
     #        empty_time - the time when the space is known to be empty
 
     t = x.size
-    pos = np.where(x != 0)[0] # assume x[0] must be zero?
-    A = 0 # arrival count
-    for i in range(len(pos)):
-        if pos[i] == 0:
-            continue
-        if x[pos[i]-1] < x[pos[i]]:
-            A += x[pos[i]]-x[pos[i]-1]
-
-    D = 0 # departure count
-    for i in range(2,t):
-        if x[i-1] > x[i]:
-            D += x[i-1]-x[i]
+    jumps = np.diff(x)
+    # arrival count, the increments to a nonzero occupancy
+    A = np.sum(np.where(x[1:] != 0, np.clip(jumps, 0, None), 0))
+    # departure count, the decrements from the third sample on
+    D = np.sum(np.clip(-jumps[1:], 0, None))
     lam = A/t;
-    queue_length = sum(x)
+    queue_length = np.sum(x)
     if queue_length == 0:
         if h > empty_time:
             mu = 100
@@ -29,4 +22,45 @@ def param_inference(x,h,empty_time):
     else:
         mu = D/queue_length
 
-    return lam, mu
\ No newline at end of file
+    return lam, mu
+
+def param_inference_cumulative_counts(data):
+    # Cumulative counts used to infer the parameters of any segment of the
+    # data with param_inference_from_counts, without looping over the samples
+    # Input: data - data (np array), one row per day
+    # Outputs: arr_cum - arr_cum[:,t] is the number of arrivals before t
+    #          dep_cum - dep_cum[:,t] is the number of departures before t
+    #          queue_cum - queue_cum[:,t] is the sum of the data before t
+    # Each output has one more column than the data, starting with zeros
+
+    data = np.atleast_2d(data)
+    jumps = np.diff(data, axis=1)
+    zeros = np.zeros((data.shape[0],2))
+    arr_cum = np.cumsum(np.hstack((zeros, np.clip(jumps, 0, None))), axis=1)
+    dep_cum = np.cumsum(np.hstack((zeros, np.clip(-jumps, 0, None))), axis=1)
+    queue_cum = np.cumsum(np.hstack((zeros[:,:1], data)), axis=1)
+
+    return arr_cum, dep_cum, queue_cum
+
+
+def param_inference_from_counts(arr_cum, dep_cum, queue_cum, left, right, h, empty_time):
+    # Vectorized param_inference of the segments x[left:right], given the
+    # cumulative counts of param_inference_cumulative_counts
+    # Inputs: left, right - segment boundaries, integers or np arrays that
+    #                       broadcast with the rows of the counts
+    #         h - hour of each segment
+    #         empty_time - the time when the space is known to be empty
+    # Outputs: lam, mu - arrays of the broadcast shape of the inputs
+
+    left, right = np.broadcast_arrays(left, right)
+    t = right - left
+    # as in param_inference, arrivals are counted from the second sample of
+    # the segment and departures from the third one
+    A = arr_cum[...,right] - arr_cum[...,np.minimum(left+1, right)]
+    D = dep_cum[...,right] - dep_cum[...,np.minimum(left+2, right)]
+    queue_length = queue_cum[...,right] - queue_cum[...,left]
+    lam = A/t
+    with np.errstate(divide='ignore', invalid='ignore'):
+        mu = np.where(queue_length == 0, np.where(np.asarray(h) > empty_time, 100, 1e-5), D/queue_length)
+
+    return lam, mu
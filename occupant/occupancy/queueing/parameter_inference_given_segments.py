@@ -1,17 +1,52 @@
+from __future__ import division
 import numpy as np
-from parameter_inference import param_inference
 
 def parameter_inference_given_segment(x, seg_point, empty_time):
-    if any(x <0):
-        neg_ind = np.where(x <0)
+    # Infer the arrival and departure rates of each segment of one day of data
+    # Inputs: x - data (np array)
+    #         seg_point - sorted breakpoints
+    #         empty_time - the time when the space is known to be empty
+    # Outputs: lam_vec, mu_vec - rates of each segment, np arrays with one
+    #          more entry than seg_point
+    lam, mu = parameter_inference_given_segments(np.asarray(x)[np.newaxis,:], seg_point, empty_time)
+    return lam[:,0], mu[:,0]
+
+def parameter_inference_given_segments(data, seg_point, empty_time):
+    # Infer the arrival and departure rates of each segment of each day of the
+    # training data at once, as param_inference does for one segment of one day
+    # Inputs: data - training data (np array), one row per day
+    #         seg_point - sorted breakpoints, shared by all days
+    #         empty_time - the time when the space is known to be empty
+    # Outputs: lam, mu - rates of each segment (rows) of each day (columns)
+    data = np.asarray(data, dtype=float)
+    if np.any(data < 0):
         raise ValueError('negative occupancy')
 
-    segs = np.concatenate((np.array([0]),seg_point, np.array([len(x)])))
-    lam_vec = np.empty((len(segs)-1,))
-    mu_vec = np.empty((len(segs)- 1,))
+    val_size, l = data.shape
+    segs = np.concatenate((np.array([0]), seg_point, np.array([l]))).astype(int)
+    starts = segs[:-1]
+    t = np.diff(segs)
+    if np.any(t <= 0):
+        raise ValueError('empty segment')
+
+    # increments and decrements at each time step, zero at the first one
+    jumps = np.hstack((np.zeros((val_size,1)), np.diff(data, axis=1)))
+    arrivals = np.clip(jumps, 0, None)
+    departures = np.clip(-jumps, 0, None)
+
+    # arrivals are counted from the second sample of each segment and
+    # departures from the third one
+    A = np.add.reduceat(arrivals, starts, axis=1) - arrivals[:,starts]
+    D = np.add.reduceat(departures, starts, axis=1) - departures[:,starts]
+    second = starts+1 < segs[1:]
+    D[:,second] -= departures[:,starts[second]+1]
+    queue_length = np.add.reduceat(data, starts, axis=1)
+
+    lam = A/t
+    # the hour of a segment is its end, empty segments after empty_time are
+    # left at once
+    h = segs[1:]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        mu = np.where(queue_length == 0, np.where(h > empty_time, 100, 1e-5), D/queue_length)
 
-    for i in range(1,len(segs)-1):
-        x_seg = x[segs[i-1]:segs[i]]
-        h = segs[i]
-        [lam_vec[i-1],mu_vec[i-1]] = param_inference(x_seg,h,empty_time)
-    return lam_vec,mu_vec
\ No newline at end of file
+    return lam.T, mu.T
@@ -0,0 +1,23 @@
+import numpy as np
+
+
+def random_stream(seed, *keys):
+    # Independent random stream identified by a seed and a sequence of keys,
+    # such as the day of the week of an estimation or the date of a
+    # simulation, so that every unit of work draws the same random numbers
+    # whichever process runs it and in whichever order
+    # The seed and the keys initialize the Mersenne Twister of a numpy
+    # RandomState by array, so that streams with different keys are
+    # independent.
+    # Inputs: seed - non-negative integer, or None to draw from the global
+    #                random state
+    #         keys - non-negative integers identifying the stream
+    # Output: random_state - numpy RandomState, or None if seed is None
+
+    if seed is None:
+        return None
+    keys = [int(seed)] + [int(key) for key in keys]
+    if any(key < 0 or key >= 2**32 for key in keys):
+        raise ValueError('Seed and stream keys must be integers between 0 and 2**32-1.')
+
+    return np.random.RandomState(keys)
@@ -0,0 +1,79 @@
+from __future__ import division
+import numpy as np
+
+
+class RunningMoments(object):
+    # Streaming mean and standard deviation of a sequence of observations of a
+    # vector, with memory independent of the number of observations
+    # Batches of observations are merged with Welford's algorithm as
+    # generalized by Chan et al. for the combination of two samples.
+    # Inputs: size - the length of the observed vector
+
+    def __init__(self, size):
+        self.count = 0
+        self.mean = np.zeros((size,))
+        self.m2 = np.zeros((size,))
+
+    def update(self, batch):
+        # Add a batch of observations, a numpy array with one column per
+        # observation
+        batch = np.asarray(batch, dtype=float)
+        count_batch = batch.shape[1]
+        if count_batch == 0:
+            return
+        mean_batch = np.mean(batch, axis=1)
+        m2_batch = np.sum((batch - mean_batch[:,np.newaxis])**2, axis=1)
+        count = self.count + count_batch
+        delta = mean_batch - self.mean
+        self.mean = self.mean + delta*count_batch/count
+        self.m2 = self.m2 + m2_batch + delta**2*self.count*count_batch/count
+        self.count = count
+
+    def std(self):
+        # Population standard deviation of the observations, as np.std
+        return np.sqrt(self.m2/self.count)
+
+
+class CountQuantiles(object):
+    # Streaming quantiles of a sequence of observations of a vector of
+    # non-negative integers, such as the queue system size, with memory
+    # independent of the number of observations
+    # The number of observations of each value is kept for each entry of the
+    # vector, which makes the quantiles exact, unlike estimators for
+    # continuous data such as the P-square algorithm, which interpolate
+    # between the integer values.
+    # Inputs: probabilities - the probabilities of the quantiles, in (0, 1)
+    #         size - the length of the observed vector
+
+    def __init__(self, probabilities, size):
+        self.probabilities = np.asarray(probabilities, dtype=float)
+        if np.any(self.probabilities <= 0) or np.any(self.probabilities >= 1):
+            raise ValueError('Quantile probabilities must be between 0 and 1.')
+        self.count = 0
+        # number of observations of each value (columns) of each entry (rows)
+        self.value_counts = np.zeros((size, 1), dtype=int)
+
+    def update(self, batch):
+        # Add a batch of observations, a numpy array with one column per
+        # observation
+        values = np.asarray(batch).astype(int)
+        if values.size == 0:
+            return
+        if np.any(values != batch) or np.any(values < 0):
+            raise ValueError('Observations must be non-negative integers.')
+        size, width = self.value_counts.shape
+        if values.max() >= width:
+            width = values.max()+1
+            self.value_counts = np.hstack((self.value_counts, np.zeros((size, width-self.value_counts.shape[1]), dtype=int)))
+        flat = np.arange(size)[:,np.newaxis]*width + values
+        self.value_counts += np.bincount(flat.ravel(), minlength=size*width).reshape((size, width))
+        self.count += values.shape[1]
+
+    def quantiles(self):
+        # Quantiles of the observations, the smallest values whose cumulative
+        # frequency reaches the probabilities, a numpy array with one row per
+        # probability
+        cdf = np.cumsum(self.value_counts, axis=1)/self.count
+        quantile = np.sum(cdf[np.newaxis,:,:] < self.probabilities[:,np.newaxis,np.newaxis]-1e-12, axis=2)
+
+        return quantile.astype(float)
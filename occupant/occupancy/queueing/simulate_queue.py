@@ -1,19 +1,26 @@
 from __future__ import division
 import numpy as np
 from unique_last import unique_last
+from running_statistics import RunningMoments, CountQuantiles
 import matplotlib.pyplot as plt
 import warnings
 
 
 
-def simulate_queue(maxtime,lam,mu,nstart,empty_time):
+def simulate_queue(maxtime,lam,mu,nstart,empty_time,mu_cum=None,random_state=None):
     # Function for simulate queue system size given the queue parameters
     # Inputs: maxtime - the time range for simualtion
     # lam - arrival rate (vector for nonhomogeneous queue), a numpy array
     # mu - departure rate (vector for nonhomogeneous queue), a numpy array
     # nstart - the number of customers in the system at the beginning of simulation
     # empty_time - the time when the queue system is known to have zero customer
+    # mu_cum - cumulative hazard of mu as returned by cumulative_hazard,
+    #          computed from mu if not given
+    # random_state - numpy RandomState to draw from, the global numpy random
+    #                state if not given
 
+    if random_state is None:
+        random_state = np.random
 
     # First, generate arrivals from homogeneous Poisson process with parameter 1
     lam_max = max(lam)
@@ -35,11 +42,11 @@ def simulate_queue(maxtime,lam,mu,nstart,empty_time):
 
     # print 'lambda is', lam
 
-    npoints = np.random.poisson(maxtime*lam_max)
+    npoints = random_state.poisson(maxtime*lam_max)
 
     # Given that the number of arrivals is npoints, the arrivals are distributed uniformly
     if npoints>0:
-        arrtimes = np.sort(np.random.uniform(0,1,npoints)*maxtime)
+        arrtimes = np.sort(random_state.uniform(0,1,npoints)*maxtime)
     else:
         jmptimes = None
         syssize = None
@@ -51,7 +58,7 @@ def simulate_queue(maxtime,lam,mu,nstart,empty_time):
 
 
     # the set of accepted events
-    r = np.random.uniform(0,1,arrtimes.size)
+    r = random_state.uniform(0,1,arrtimes.size)
     if empty_time is None: # if the segment does not contain the empty region
         E = arrtimes[np.where(r-lam_vec <0)]
     else:
@@ -74,21 +81,11 @@ def simulate_queue(maxtime,lam,mu,nstart,empty_time):
     ntotal = E.size
     keeptimes = np.floor(E).astype(int)
 
-    servtimes = []
-    if not empty_time:
-        for i in range(ntotal):
-            serv_sample = simulate_service(keeptimes[i],mu)
-            if serv_sample is None:
-                serv_sample = maxtime-1
-            servtimes.append(serv_sample)
-    else:
-        trunc_length = empty_time-keeptimes
-        for i in range(ntotal):
-            if trunc_length[i] == 0:
-                raise NameError('Truncation length zero')
-            serv_sample = simulate_service_with_trunc(keeptimes[i],mu,trunc_length[i])
-            servtimes.append(serv_sample)
-    servtimes_array = np.array(servtimes)
+    if mu_cum is None:
+        mu_cum = cumulative_hazard(mu)
+    if empty_time and np.any(keeptimes >= empty_time):
+        raise NameError('Truncation length zero')
+    servtimes_array = simulate_service(keeptimes,mu_cum,maxtime,empty_time,random_state)
     deptimes = np.add(keeptimes,servtimes_array)
 
     # sort all the arrivals and departures
@@ -112,27 +109,194 @@ def simulate_queue(maxtime,lam,mu,nstart,empty_time):
 
 
 
-def simulate_service(arrtime, mu):
-    mu_used = mu[arrtime:]
-    mu_cum = np.cumsum(mu_used)
-    cdf = 1- np.exp(-mu_cum)
-    r = np.random.uniform(0,1,1)
-    temp = np.where(cdf > r)
-    if temp[0].size!=0:
-        return temp[0][0]
+def simulate_queue_batch(maxtime,lam,mu,nstart,empty_time,n_iter,mu_cum=None,random_state=None):
+    # Function for simulating the queue system size of many independent
+    # realizations at once
+    # Inputs: maxtime - the time range for simulation
+    # lam - arrival rate (vector for nonhomogeneous queue), a numpy array, or
+    #       a numpy array with one row per rate profile to simulate n_iter
+    #       realizations of each profile at once
+    # mu - departure rate (vector for nonhomogeneous queue), a numpy array
+    #      with the same shape as lam
+    # nstart - the number of customers in the system at the beginning of
+    #          simulation, either a scalar or a numpy array with one entry per
+    #          realization, of shape (n_iter,) or (number of profiles, n_iter)
+    # empty_time - the time when the queue system is known to have zero customer
+    # n_iter - the number of realizations to simulate
+    # mu_cum - cumulative hazard of mu as returned by cumulative_hazard,
+    #          computed from mu if not given
+    # random_state - numpy RandomState to draw from, the global numpy random
+    #                state if not given
+    # Output: syssize_mc - system size at each integer time step of each
+    #         realization, a numpy array of shape (maxtime, n_iter), or of
+    #         shape (maxtime, number of profiles*n_iter) with the realizations
+    #         of each profile one after another if lam has one row per profile
+
+    if random_state is None:
+        random_state = np.random
+    lam = np.asarray(lam, dtype=float)
+    if mu_cum is None:
+        mu_cum = cumulative_hazard(mu)
+    if lam.ndim == 1:
+        n_prof = 1
+        lam = lam[np.newaxis,:]
+    else:
+        n_prof = lam.shape[0]
+    n_real = n_prof*n_iter
+    nstart = np.broadcast_to(np.asarray(nstart), (n_prof, n_iter)).reshape((n_real,)).astype(int)
+    lam_max = np.max(lam, axis=1)
+
+    # First, generate the arrivals of all realizations from homogeneous Poisson
+    # processes with parameter lam_max, uniformly distributed within each
+    # realization, and flatten them into a single array
+    if np.any(lam_max > 0):
+        npoints = random_state.poisson(np.repeat(maxtime*lam_max, n_iter))
+    else:
+        npoints = np.zeros((n_real,), dtype=int)
+    iter_idx = np.repeat(np.arange(n_real), npoints)
+    arrtimes = random_state.uniform(0,1,iter_idx.size)*maxtime
+    arrtimes_floor = np.floor(arrtimes).astype(int)
+
+    # the set of accepted events, thinned by the non-homogeneous arrival rate
+    # of the profile of each realization
+    if np.any(lam_max > 0):
+        prof_idx = iter_idx // n_iter
+        r = random_state.uniform(0,1,arrtimes.size)
+        accept = r < lam[prof_idx, arrtimes_floor]/lam_max[prof_idx]
+        if empty_time is not None:
+            accept = np.logical_and(accept, arrtimes_floor < empty_time)
+    else:
+        accept = np.zeros((0,), dtype=bool)
+
+    # customers initially in the system arrive at time zero
+    keeptimes = np.concatenate((np.zeros((nstart.sum(),), dtype=int), arrtimes_floor[accept]))
+    iter_idx = np.concatenate((np.repeat(np.arange(n_real), nstart), iter_idx[accept]))
+
+    # draw the service times of all customers
+    if mu_cum.ndim == 1:
+        servtimes = simulate_service(keeptimes, mu_cum, maxtime, empty_time, random_state)
     else:
-        return None
+        servtimes = simulate_service(keeptimes, mu_cum, maxtime, empty_time, random_state, iter_idx // n_iter)
+    deptimes = keeptimes + servtimes
+
+    # count the net number of jumps of each realization at each time step,
+    # dropping the departures falling outside of the time window of interest
+    inside = deptimes < maxtime
+    jumps = np.bincount(iter_idx*maxtime + keeptimes, minlength=n_real*maxtime) \
+            - np.bincount(iter_idx[inside]*maxtime + deptimes[inside], minlength=n_real*maxtime)
+    syssize = np.cumsum(jumps.reshape((n_real, maxtime)), axis=1)
+
+    # the system size at a time step is the one before the jumps at that time
+    # step, except for the first time step
+    syssize_mc = np.empty((maxtime, n_real))
+    syssize_mc[0, :] = syssize[:, 0]
+    syssize_mc[1:, :] = syssize[:, :-1].T
+
+    return syssize_mc
+
+
+def simulate_queue_statistics(maxtime,lam,mu,nstart,empty_time,n_iter,quantiles=(),chunk_size=1000,mu_cum=None,random_state=None):
+    # Function for computing the statistics of the queue system size over many
+    # independent realizations, simulated in chunks of at most chunk_size
+    # realizations and reduced with streaming accumulators so that the memory
+    # does not grow with n_iter
+    # Inputs: maxtime, lam, mu, nstart, empty_time, n_iter, mu_cum,
+    #         random_state - see simulate_queue_batch, where nstart is a
+    #         scalar
+    # quantiles - the probabilities of the quantiles of the system size to
+    #             estimate, in (0, 1)
+    # chunk_size - the maximum number of realizations simulated at once
+    # Outputs: mean, std - mean and standard deviation of the system size at
+    #          each integer time step, numpy arrays of length maxtime
+    #          quantile - estimated quantiles of the system size, a numpy
+    #          array with one row per probability in quantiles
+
+    if mu_cum is None:
+        mu_cum = cumulative_hazard(mu)
+    moments = RunningMoments(maxtime)
+    if len(quantiles):
+        quantile_est = CountQuantiles(quantiles, maxtime)
+    for start in range(0, n_iter, chunk_size):
+        n_chunk = min(chunk_size, n_iter-start)
+        syssize_mc = simulate_queue_batch(maxtime,lam,mu,nstart,empty_time,n_chunk,mu_cum,random_state)
+        moments.update(syssize_mc)
+        if len(quantiles):
+            quantile_est.update(syssize_mc)
+    if len(quantiles):
+        quantile = quantile_est.quantiles()
+    else:
+        quantile = np.zeros((0,maxtime))
+
+    return moments.mean, moments.std(), quantile
+
+
+def cumulative_hazard(mu):
+    # Cumulative hazard of the departure rate, mu_cum[t] is the sum of mu over
+    # the time steps before t so that mu_cum has one more entry than mu
+    # It only needs to be computed once per departure rate profile, and is
+    # computed along the last axis for a numpy array with one row per profile
+
+    mu = np.asarray(mu, dtype=float)
+    return np.concatenate((np.zeros(mu.shape[:-1]+(1,)), np.cumsum(mu, axis=-1)), axis=-1)
+
+
+def simulate_service(arrtimes, mu_cum, maxtime, empty_time, random_state=None, profile=None):
+    # Draw the service times of an array of integer arrival times by inverting
+    # the service time distribution with the cumulative hazard mu_cum
+    # A customer arriving at time step k departs after j time steps, where j
+    # is the first time step for which the probability of having departed,
+    # 1-exp(-(mu_cum[k+j+1]-mu_cum[k])), exceeds a uniform draw r
+    # With empty_time, the distribution is truncated so that all customers
+    # depart before empty_time
+    # The uniform draws come from random_state, a numpy RandomState, or from
+    # the global numpy random state if not given
+    # If mu_cum has one row per departure rate profile, profile gives the row
+    # of the profile of each customer
+
+    if random_state is None:
+        random_state = np.random
+    arrtimes = np.asarray(arrtimes, dtype=int)
+    r = random_state.uniform(0,1,arrtimes.size)
+    size = mu_cum.shape[-1]
+    if profile is None:
+        hazard_arr = mu_cum[arrtimes]
+    else:
+        hazard_arr = mu_cum[profile, arrtimes]
+    if not empty_time:
+        target = hazard_arr - np.log1p(-r)
+    else:
+        trunc_time = min(empty_time, size-1)
+        if profile is None:
+            hazard_trunc = mu_cum[trunc_time]
+        else:
+            hazard_trunc = mu_cum[profile, trunc_time]
+        prob_trunc = -np.expm1(hazard_arr - hazard_trunc)
+        target = hazard_arr - np.log1p(-r*prob_trunc)
+    if profile is None:
+        servtimes = np.searchsorted(mu_cum, target, side='right') - arrtimes - 1
+    else:
+        servtimes = _searchsorted_rows(mu_cum, profile, target) - arrtimes - 1
+    if not empty_time:
+        # customers not departing within the time range stay until the end
+        servtimes[servtimes + arrtimes + 1 == size] = maxtime-1
+    else:
+        servtimes = np.minimum(servtimes, trunc_time - arrtimes - 1)
+
+    return servtimes
+
 
+def _searchsorted_rows(cum, rows, target):
+    # Index at which each target would be inserted on the right into its row
+    # of cum, as np.searchsorted with side='right', by a binary search over
+    # all targets at once
 
-def simulate_service_with_trunc(arrtime,mu,trunc_length):
-    mu_used = mu[arrtime:arrtime+trunc_length]
-    mu_cum = np.cumsum(mu_used)
-    cdf = (1-np.exp(-mu_cum))/(1-np.exp(-mu_cum[-1]))
-    r = np.random.uniform(0,1,1)
-    temp = np.where(cdf > r)
+    lo = np.zeros(target.shape, dtype=int)
+    hi = np.full(target.shape, cum.shape[1], dtype=int)
+    while np.any(lo < hi):
+        active = lo < hi
+        mid = (lo + hi)//2
+        below = target < cum[rows, np.minimum(mid, cum.shape[1]-1)]
+        hi = np.where(np.logical_and(active, below), mid, hi)
+        lo = np.where(np.logical_and(active, np.logical_not(below)), mid+1, lo)
 
-    try:
-        answer = temp[0][0]
-        return answer
-    except:
-        print('temp = ', temp)
\ No newline at end of file
+    return lo
@@ -1,5 +1,3 @@
-
-
 # modify the built-in function "unique"
 # To handle the case where there are more than one jump during 1 minute interval
 
@@ -7,13 +5,10 @@ import numpy as np
 
 
 def unique_last(x):
-    C, ia, ic = np.unique(x,return_index=True,return_inverse=True)
-    ic_unique = np.unique(ic)
-    for i in range(len(ic_unique)):
-        ic_idx = np.where(ic == ic_unique[i])
-        ic_idx_last = ic_idx[0][-1]
-        ic_idx_first = ic_idx[0][0]
-        ia_idx = np.where(ia == ic_idx_first)
-        ia[ia_idx] = ic_idx_last
-    ia = np.sort(ia)
+    # Unique values of x and the sorted indices of their last occurrences in x
+    # The last occurrence of each value is its first occurrence in the
+    # reversed array, which np.unique finds in O(n log n).
+    x = np.asarray(x)
+    C, ia_reversed = np.unique(x[::-1],return_index=True)
+    ia = np.sort(x.size-1-ia_reversed)
     return C,ia
@@ -11,11 +11,25 @@ from mpcpy import variables
 from testing import TestCaseMPCPy
 import unittest
 import numpy as np
-import pickle
 import copy
 import os
 import pandas as pd
 
+def _load_occupancy_model():
+    '''Load the occupancy model estimated by the occupancy model tests, 
+    estimating it with the same seed if it was not saved yet.
+
+    '''
+
+    # Imported here so that the test classes of test_models are not 
+    # collected with the tests of this module
+    from test_models import OccupancyFromQueueing
+    test = OccupancyFromQueueing('test_estimate');
+    test.setUp();
+    test._load_occupancy_model();
+
+    return test.occupancy
+
 #%% Weather Tests
 class WeatherFromEPW(TestCaseMPCPy):
     '''Test the collection of weather data from an EPW.
@@ -308,10 +322,7 @@ class InternalFromOccupancyModel(TestCaseMPCPy):
         start_time_occupancy = '4/1/2013';
         final_time_occupancy = '4/7/2013 23:55:00';
         # Load occupancy models
-        with open(os.path.join(utility.get_MPCPy_path(), 'unittests', 'references', \
-                               'test_models', 'OccupancyFromQueueing', \
-                               'occupancy_model_estimated.txt'), 'r') as f:
-            occupancy_model = pickle.load(f);
+        occupancy_model = _load_occupancy_model();
         # Define zones and loads
         zone_list = ['wes', 'hal', 'eas'];
         load_list = [[0.4,0.4,0.2], [0.4,0.4,0.2], [0.4,0.4,0.2]];
@@ -609,9 +620,7 @@ class ConstraintFromOccupancyModel(TestCaseMPCPy):
         start_time_occupancy = '3/1/2012';
         final_time_occupancy = '3/7/2012 23:55:00';
         # Load occupancy models
-        with open(os.path.join(self.get_unittest_path(), 'references', 'test_models',\
-                               'OccupancyFromQueueing', 'occupancy_model_estimated.txt'), 'r') as f:
-            occupancy_model = pickle.load(f);
+        occupancy_model = _load_occupancy_model();
         # Define state variables and values
         state_variable_list = ['wesTdb', 'wesTdb', 'easTdb', 'easTdb', 'halTdb', 'halTdb'];
         values_list = [[25,30], [20,15], [25+273.15, 30+273.15], [20+273.15, 15+273.15], [25,30], [20,15]];
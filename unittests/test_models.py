@@ -11,6 +11,17 @@ from mpcpy import systems
 from mpcpy import units
 from mpcpy import variables
 from testing import TestCaseMPCPy
+from occupant.occupancy.queueing.simulate_queue import simulate_queue_batch, simulate_queue_statistics
+from occupant.occupancy.queueing.occupancy_moments import occupancy_moments, occupancy_quantiles
+from occupant.occupancy.queueing.running_statistics import RunningMoments, CountQuantiles
+from occupant.occupancy.queueing.unique_last import unique_last
+from occupant.occupancy.queueing.interp1 import interp1
+from occupant.occupancy.queueing.random_streams import random_stream
+from occupant.occupancy.queueing.parameter_inference_given_segments import parameter_inference_given_segment, parameter_inference_given_segments
+from occupant.occupancy.queueing.parameter_inference import param_inference, param_inference_cumulative_counts, param_inference_from_counts
+from occupant.occupancy.queueing.adaptive_breakpoint_placement import adaptive_breakpoint_placement, coarse_to_fine_breakpoint_placement, _refine_breakpoint
+from occupant.occupancy.queueing.optimal_breakpoint_placement import optimal_breakpoint_placement
+from occupant.occupancy.markov.markov_chain import transition_counts, transition_matrices, propagate_distribution, simulate_markov_chain_batch, empirical_distribution, distribution_statistics
 import pandas as pd
 import numpy as np
 from matplotlib import pyplot as plt
@@ -650,6 +661,25 @@ class OccupancyFromQueueing(TestCaseMPCPy):
     def test_estimate(self):
         '''Test the estimation method.'''
         plt.close('all');
+        self._estimate_occupancy_model();
+        try:
+            with open(self.occupancy_model_file, 'r') as f:
+                self.occupancy = pickle.load(f);
+        except IOError:
+            self._save_occupancy_model();
+
+    def test_pickle_default_options(self):
+        '''Test loading a model pickled without the latest options.'''
+        occupancy_method = models.QueueModel();
+        for key in ['method', 'quantiles', 'seed', 'n_jobs']:
+            del occupancy_method.simulate_options[key];
+        del occupancy_method.estimate_options['score_method'];
+        occupancy_method = pickle.loads(pickle.dumps(occupancy_method));
+        self.assertEqual(occupancy_method.simulate_options, models.QueueModel().simulate_options);
+        self.assertEqual(occupancy_method.estimate_options, models.QueueModel().estimate_options);
+
+    def _estimate_occupancy_model(self):
+        '''Estimate the occupancy model used by the prediction tests.'''
         # Training Time
         start_time = '2/1/2013';
         final_time = '7/24/2013 23:59';
@@ -657,26 +687,207 @@ class OccupancyFromQueueing(TestCaseMPCPy):
         self.building.collect_measurements(start_time, final_time);
         # Instantiate occupancy model
         self.occupancy = models.Occupancy(models.QueueModel, self.building.measurements);
-        # Estimate occupancy model parameters
-        np.random.seed(1);
-        self.occupancy.estimate(start_time, final_time);
+        # Estimate occupancy model parameters with seeded random numbers, 
+        # so that the reference predictions are reproducible
+        estimate_options = self.occupancy.get_estimate_options();
+        estimate_options['seed'] = 1;
+        self.occupancy.estimate(start_time, final_time, estimate_options = estimate_options);
+
+    def _save_occupancy_model(self):
+        '''Save the estimated occupancy model for the prediction tests.'''
+        try:
+            os.makedirs(self.get_ref_path());
+        except OSError:
+            pass;
+        with open(self.occupancy_model_file, 'w') as f:
+            pickle.dump(self.occupancy, f);
+
+    def _load_occupancy_model(self):
+        '''Load the estimated occupancy model, estimating it if it was not 
+        saved yet.'''
         try:
             with open(self.occupancy_model_file, 'r') as f:
                 self.occupancy = pickle.load(f);
         except IOError:
-            try:
-                os.makedirs(self.get_ref_path());
-            except OSError:
-                pass;
-            with open(self.occupancy_model_file, 'w') as f:
-                pickle.dump(self.occupancy, f);
+            self._estimate_occupancy_model();
+            self._save_occupancy_model();
+
+    def test_estimate_parallel(self):
+        '''Test the estimation method with the days estimated in parallel.'''
+        plt.close('all');
+        # Training Time
+        start_time = '3/1/2013';
+        final_time = '3/28/2013 23:59';
+        # Collect measurements
+        self.building.collect_measurements(start_time, final_time);
+        # Instantiate occupancy model
+        occupancy = models.Occupancy(models.QueueModel, self.building.measurements);
+        # Estimate occupancy model parameters in two processes
+        estimate_options = occupancy.get_estimate_options();
+        estimate_options['n_jobs'] = 2;
+        np.random.seed(1);
+        occupancy.estimate(start_time, final_time, estimate_options = estimate_options);
+        # Check parameters are estimated for each day of the week
+        for day in range(7):
+            seg_num = len(occupancy._occupancy_method.seg_point[day])+1;
+            self.assertEqual(len(occupancy.parameters_data['lam'][day]['Value'].get_base_data()), seg_num);
+            self.assertEqual(len(occupancy.parameters_data['mu'][day]['Value'].get_base_data()), seg_num);
+
+    def test_estimate_and_simulate_seed(self):
+        '''Test the reproducibility of seeded estimation and simulation.'''
+        plt.close('all');
+        # Training Time
+        start_time = '3/1/2013';
+        final_time = '3/28/2013 23:59';
+        # Collect measurements
+        self.building.collect_measurements(start_time, final_time);
+        # Estimate seeded occupancy models in one and two processes
+        seg_point = [];
+        for n_jobs in [1, 2]:
+            occupancy = models.Occupancy(models.QueueModel, self.building.measurements);
+            estimate_options = occupancy.get_estimate_options();
+            estimate_options['seed'] = 1;
+            estimate_options['n_jobs'] = n_jobs;
+            occupancy.estimate(start_time, final_time, estimate_options = estimate_options);
+            seg_point.append(occupancy._occupancy_method.seg_point);
+        # Check the estimations are identical
+        for day in range(7):
+            np.testing.assert_array_equal(seg_point[0][day], seg_point[1][day]);
+        # Simulate seeded occupancy model over two overlapping periods
+        simulate_options = occupancy.get_simulate_options();
+        simulate_options['seed'] = 1;
+        occupancy.simulate('3/29/2013', '3/31/2013 23:59', simulate_options = simulate_options);
+        prediction = occupancy.measurements['occupancy']['Simulated'].get_base_data();
+        occupancy.simulate('3/30/2013', '3/30/2013 23:59', simulate_options = simulate_options);
+        prediction_day = occupancy.measurements['occupancy']['Simulated'].get_base_data();
+        # Check the predictions of the common day are identical
+        np.testing.assert_array_equal(prediction.loc[prediction_day.index].values, prediction_day.values);
+
+    def test_estimate_pelt(self):
+        '''Test the estimation method with optimal breakpoint placement.'''
+        plt.close('all');
+        # Training Time
+        start_time = '3/1/2013';
+        final_time = '3/28/2013 23:59';
+        # Collect measurements
+        self.building.collect_measurements(start_time, final_time);
+        # Instantiate occupancy model
+        occupancy = models.Occupancy(models.QueueModelPELT, self.building.measurements);
+        # Estimate occupancy model parameters twice
+        occupancy.estimate(start_time, final_time);
+        seg_point = occupancy._occupancy_method.seg_point;
+        lam = [occupancy.parameters_data['lam'][day]['Value'].get_base_data() for day in range(7)];
+        occupancy.estimate(start_time, final_time);
+        for day in range(7):
+            # Check parameters are estimated for each day of the week
+            seg_num = len(occupancy._occupancy_method.seg_point[day])+1;
+            self.assertEqual(len(occupancy.parameters_data['lam'][day]['Value'].get_base_data()), seg_num);
+            self.assertEqual(len(occupancy.parameters_data['mu'][day]['Value'].get_base_data()), seg_num);
+            # Check the estimation is reproducible
+            np.testing.assert_array_equal(occupancy._occupancy_method.seg_point[day], seg_point[day]);
+            np.testing.assert_array_equal(occupancy.parameters_data['lam'][day]['Value'].get_base_data(), lam[day]);
+        # Check prediction
+        occupancy.simulate('3/29/2013', '3/29/2013 23:59');
+        self.assertTrue(np.all(occupancy.measurements['occupancy']['Simulated'].get_base_data() >= 0));
+
+    def test_estimate_portfolio(self):
+        '''Test the estimation of the occupancy models of many spaces at once.'''
+        plt.close('all');
+        # Training Time
+        start_time = '3/1/2013';
+        final_time = '3/28/2013 23:59';
+        # Collect measurements of three spaces, one of which was not 
+        # measured during the first week and part of a day
+        self.building.collect_measurements(start_time, final_time);
+        ts = self.building.measurements['occupancy']['Measured'].get_base_data();
+        measurements = {};
+        measurements['lobby'] = self.building.measurements;
+        measurements['office'] = {'occupancy' : {'Sample' : variables.Static('occupancy_sample', 300, units.s), \
+                                                 'Measured' : variables.Timeseries('occupancy', np.floor(ts/2), units.unit1)}};
+        ts_hall = np.ceil(ts/3)['3/8/2013':].drop(ts['3/20/2013 10:00':'3/20/2013 11:00'].index);
+        measurements['hall'] = {'occupancy' : {'Sample' : variables.Static('occupancy_sample', 300, units.s), \
+                                               'Measured' : variables.Timeseries('occupancy', ts_hall, units.unit1)}};
+        for occupancy_method in [models.QueueModelPELT, models.QueueModel]:
+            # Estimate the models of all spaces at once in two processes
+            portfolio = models.OccupancyPortfolio(occupancy_method, measurements);
+            estimate_options = portfolio.get_estimate_options();
+            estimate_options['n_jobs'] = 2;
+            if occupancy_method is models.QueueModel:
+                estimate_options['score_method'] = 'analytic';
+                estimate_options['coarse_factor'] = 3;
+                estimate_options['seed'] = 1;
+            portfolio.estimate(start_time, final_time, estimate_options = estimate_options);
+            for key in measurements.keys():
+                # Check parameters are the same as estimated for each space
+                occupancy = models.Occupancy(occupancy_method, measurements[key]);
+                estimate_options['n_jobs'] = 1;
+                occupancy.estimate(start_time, final_time, estimate_options = estimate_options);
+                model = portfolio.get_model(key);
+                np.testing.assert_array_equal(model._occupancy_method.n_train, occupancy._occupancy_method.n_train);
+                for day in range(7):
+                    np.testing.assert_array_equal(model._occupancy_method.seg_point[day], occupancy._occupancy_method.seg_point[day]);
+                    np.testing.assert_array_equal(model.parameters_data['lam'][day]['Value'].get_base_data(), occupancy.parameters_data['lam'][day]['Value'].get_base_data());
+                    np.testing.assert_array_equal(model.parameters_data['mu'][day]['Value'].get_base_data(), occupancy.parameters_data['mu'][day]['Value'].get_base_data());
+        # Check prediction of each space
+        simulate_options = portfolio.get_simulate_options();
+        simulate_options['method'] = 'analytic';
+        portfolio.simulate('3/29/2013', '3/29/2013 23:59', simulate_options = simulate_options);
+        for key in measurements.keys():
+            prediction = portfolio.get_model(key).measurements['occupancy']['Simulated'].get_base_data();
+            self.assertEqual(len(prediction), 288);
+            self.assertTrue(np.all(prediction >= 0));
+
+    def test_format_training_data(self):
+        '''Test the formatting of the training data of each day of the week.'''
+        # Collect measurements
+        self.building.collect_measurements('3/1/2013', '3/28/2013 23:59');
+        ts = self.building.measurements['occupancy']['Measured'].get_base_data();
+        # Leave out points of one day and end the period with a partial day
+        measurements = {'occupancy' : {'Sample' : variables.Static('occupancy_sample', 300, units.s), \
+                                       'Measured' : variables.Timeseries('occupancy', ts.drop(ts.index[300:310]), units.unit1)}};
+        occupancy = models.Occupancy(models.QueueModel, measurements);
+        occupancy._set_time_interval('3/1/2013', '3/28/2013 12:00');
+        data_train = occupancy._occupancy_method._format_training_data(occupancy);
+        # Check the complete days of each day of the week in order
+        for day in range(7):
+            dates = [date for date in pd.date_range('3/1/2013', '3/27/2013', freq = 'D') if date.weekday() == day and date.day != 2];
+            self.assertEqual(data_train[day].shape, (len(dates), 288));
+            for i in range(len(dates)):
+                np.testing.assert_array_equal(data_train[day][i], ts[dates[i].strftime('%m/%d/%Y')].values);
+
+    def test_update(self):
+        '''Test the incremental update of the estimated parameters.'''
+        plt.close('all');
+        # Collect measurements
+        self.building.collect_measurements('3/1/2013', '3/28/2013 23:59');
+        # Instantiate occupancy model
+        occupancy = models.Occupancy(models.QueueModelPELT, self.building.measurements);
+        # Check update before estimation
+        with self.assertRaises(ValueError):
+            occupancy.update('3/15/2013', '3/28/2013 23:59');
+        # Estimate with the first two weeks and update with the last two
+        occupancy.estimate('3/1/2013', '3/14/2013 23:59');
+        seg_point = list(occupancy._occupancy_method.seg_point);
+        empty_time = list(occupancy._occupancy_method.empty_time);
+        occupancy.update('3/15/2013', '3/28/2013 23:59');
+        # Check parameters are those of all four weeks with the same breakpoints
+        ts = self.building.measurements['occupancy']['Measured'].get_base_data()['3/1/2013':'3/28/2013 23:59'];
+        for day in range(7):
+            np.testing.assert_array_equal(occupancy._occupancy_method.seg_point[day], seg_point[day]);
+            data = ts[ts.index.weekday == day].values.reshape((4, 288));
+            if np.any(data):
+                lam, mu = parameter_inference_given_segments(data, seg_point[day], empty_time[day]);
+                np.testing.assert_allclose(occupancy.parameters_data['lam'][day]['Value'].get_base_data(), np.mean(lam, axis = 1));
+                np.testing.assert_allclose(occupancy.parameters_data['mu'][day]['Value'].get_base_data(), np.mean(mu, axis = 1));
+        # Check prediction with updated parameters
+        occupancy.simulate('3/29/2013', '3/29/2013 23:59');
+        self.assertTrue(np.all(occupancy.measurements['occupancy']['Simulated'].get_base_data() >= 0));
 
     def test_simulate(self):
         '''Test occupancy prediction.'''
         plt.close('all');
         # Load occupancy model
-        with open(self.occupancy_model_file, 'r') as f:
-            self.occupancy = pickle.load(f);
+        self._load_occupancy_model();
         # Simulate occupancy model
         np.random.seed(1);
         self.occupancy.simulate(self.start_time, self.final_time);
@@ -690,8 +901,7 @@ class OccupancyFromQueueing(TestCaseMPCPy):
         '''Test occupancy prediction comparison with measured data.'''
         plt.close('all');
         # Load occupancy model
-        with open(self.occupancy_model_file, 'r') as f:
-            self.occupancy = pickle.load(f);
+        self._load_occupancy_model();
         # Collect validation measurements
         self.building.collect_measurements(self.start_time, self.final_time);
         # Set valiation measurements in occupancy model
@@ -716,8 +926,7 @@ class OccupancyFromQueueing(TestCaseMPCPy):
         '''Test generation of occupancy load data using occupancy prediction.'''
         plt.close('all');
         # Load occupancy model
-        with open(self.occupancy_model_file, 'r') as f:
-            self.occupancy = pickle.load(f);
+        self._load_occupancy_model();
         # Simulate occupancy model
         simulate_options = self.occupancy.get_simulate_options();
         simulate_options['iter_num'] = 5;
@@ -733,8 +942,7 @@ class OccupancyFromQueueing(TestCaseMPCPy):
         '''Test generation of occupancy constraint data using occupancy prediction.'''
         plt.close('all');
         # Load occupancy model
-        with open(self.occupancy_model_file, 'r') as f:
-            self.occupancy = pickle.load(f);
+        self._load_occupancy_model();
         # Simulate occupancy model
         simulate_options = self.occupancy.get_simulate_options();
         simulate_options['iter_num'] = 5;
@@ -746,6 +954,140 @@ class OccupancyFromQueueing(TestCaseMPCPy):
         df_test.index.name = 'Time';
         self.check_df(df_test, 'get_constraint.csv');
 
+    def test_get_load_constraint_cached(self):
+        '''Test the memo of loads and constraints of an occupancy prediction.'''
+        plt.close('all');
+        # Load occupancy model
+        self._load_occupancy_model();
+        # Simulate occupancy model
+        simulate_options = self.occupancy.get_simulate_options();
+        simulate_options['method'] = 'analytic';
+        self.occupancy.simulate(self.start_time, self.final_time, simulate_options = simulate_options);
+        ts = self.occupancy.measurements['occupancy']['Simulated'].get_base_data();
+        load = self.occupancy.get_load(100);
+        constraint = self.occupancy.get_constraint(20, 25);
+        # Check repeated calls reuse the results
+        self.assertIs(self.occupancy.get_load(100), load);
+        self.assertIs(self.occupancy.get_constraint(20, 25), constraint);
+        # Check values
+        np.testing.assert_allclose(load.values, 100*ts.values);
+        np.testing.assert_array_equal(constraint.values, np.where(ts.values >= 0.5, 20, 25));
+        np.testing.assert_array_equal(self.occupancy.get_constraint(25, 20).values, np.where(ts.values >= 0.5, 25, 20));
+        # Check factors and values that cannot be memoized
+        factors = np.arange(len(ts));
+        np.testing.assert_allclose(self.occupancy.get_load(factors).values, factors*ts.values);
+        np.testing.assert_array_equal(self.occupancy.get_constraint(factors, 25).values, np.where(ts.values >= 0.5, factors, 25));
+        # Check the memo is not pickled with the model
+        self.assertFalse('_prediction_cache' in pickle.loads(pickle.dumps(self.occupancy)).__dict__);
+        # Check a new simulation clears the memo
+        self.occupancy.simulate('3/29/2013', '3/29/2013 23:59', simulate_options = simulate_options);
+        self.assertEqual(len(self.occupancy.get_load(100)), 288);
+        self.assertEqual(len(self.occupancy.get_constraint(20, 25)), 288);
+
+    def test_simulate_analytic(self):
+        '''Test occupancy prediction with the analytic queue solution.'''
+        plt.close('all');
+        # Load occupancy model
+        self._load_occupancy_model();
+        # Simulate occupancy model with analytic method
+        simulate_options = self.occupancy.get_simulate_options();
+        simulate_options['method'] = 'analytic';
+        self.occupancy.simulate(self.start_time, self.final_time, simulate_options = simulate_options);
+        prediction = self.occupancy.measurements['occupancy']['Simulated'].get_base_data();
+        std = self.occupancy.measurements['occupancy']['SimulatedError'].get_base_data();
+        # Check prediction is deterministic
+        self.occupancy.simulate(self.start_time, self.final_time);
+        self.assertTrue(prediction.equals(self.occupancy.measurements['occupancy']['Simulated'].get_base_data()));
+        # Check prediction values
+        self.assertEqual(len(prediction), 8*288);
+        self.assertTrue(np.all(prediction >= 0));
+        self.assertTrue(np.allclose(std**2, prediction));
+
+    def test_simulate_parallel(self):
+        '''Test occupancy prediction with the days simulated in parallel.'''
+        plt.close('all');
+        # Load occupancy model
+        self._load_occupancy_model();
+        # Simulate seeded occupancy model in one and two processes
+        simulate_options = self.occupancy.get_simulate_options();
+        simulate_options['seed'] = 1;
+        prediction = [];
+        for n_jobs in [1, 2]:
+            simulate_options['n_jobs'] = n_jobs;
+            self.occupancy.simulate(self.start_time, self.final_time, simulate_options = simulate_options);
+            prediction.append(self.occupancy.measurements['occupancy']['Simulated'].get_base_data());
+        # Check the predictions are identical
+        self.assertTrue(prediction[0].equals(prediction[1]));
+        # Check the days of the same weekday draw different random numbers 
+        # without seed
+        simulate_options['seed'] = None;
+        np.random.seed(1);
+        self.occupancy.simulate(self.start_time, self.final_time, simulate_options = simulate_options);
+        prediction = self.occupancy.measurements['occupancy']['Simulated'].get_base_data().values;
+        self.assertFalse(np.array_equal(prediction[:288], prediction[7*288:]));
+
+    def test_simulate_long_horizon(self):
+        '''Test occupancy prediction over several weeks.'''
+        plt.close('all');
+        # Load occupancy model
+        self._load_occupancy_model();
+        # Simulate occupancy model over five weeks
+        simulate_options = self.occupancy.get_simulate_options();
+        simulate_options['method'] = 'analytic';
+        self.occupancy.simulate('6/3/2013', '7/7/2013 23:59', simulate_options = simulate_options);
+        prediction = self.occupancy.measurements['occupancy']['Simulated'].get_base_data();
+        # Check the index covers the period without gaps
+        self.assertEqual(len(prediction), 35*288);
+        self.assertTrue(prediction.index.is_unique);
+        self.assertTrue(np.all(np.diff(prediction.index.values) == np.timedelta64(300, 's')));
+        # Check the prediction repeats every week
+        np.testing.assert_array_equal(prediction.values[:-7*288], prediction.values[7*288:]);
+
+    def test_simulate_quantiles(self):
+        '''Test occupancy prediction of quantiles.'''
+        plt.close('all');
+        # Load occupancy model
+        self._load_occupancy_model();
+        simulate_options = self.occupancy.get_simulate_options();
+        simulate_options['quantiles'] = [0.1, 0.5, 0.9];
+        for method in ['monte_carlo', 'analytic']:
+            # Simulate occupancy model with quantiles
+            simulate_options['method'] = method;
+            np.random.seed(1);
+            self.occupancy.simulate(self.start_time, self.final_time, simulate_options = simulate_options);
+            q10 = self.occupancy.measurements['occupancy']['SimulatedQuantile10'].get_base_data();
+            q50 = self.occupancy.measurements['occupancy']['SimulatedQuantile50'].get_base_data();
+            q90 = self.occupancy.measurements['occupancy']['SimulatedQuantile90'].get_base_data();
+            # Check quantile values
+            self.assertEqual(len(q50), 8*288);
+            self.assertTrue(np.all(q10 <= q50));
+            self.assertTrue(np.all(q50 <= q90));
+            self.assertTrue(np.all(np.mod(q50, 1) == 0));
+        # Check the quantiles of a previous simulation are removed
+        simulate_options['quantiles'] = [0.5];
+        self.occupancy.simulate(self.start_time, self.final_time, simulate_options = simulate_options);
+        keys = [key for key in self.occupancy.measurements['occupancy'].keys() if key.startswith('SimulatedQuantile')];
+        self.assertEqual(keys, ['SimulatedQuantile50']);
+        simulate_options['quantiles'] = [];
+        self.occupancy.simulate(self.start_time, self.final_time, simulate_options = simulate_options);
+        keys = [key for key in self.occupancy.measurements['occupancy'].keys() if key.startswith('SimulatedQuantile')];
+        self.assertEqual(keys, []);
+        # Check invalid quantile probability
+        simulate_options['quantiles'] = [90];
+        with self.assertRaises(ValueError):
+            self.occupancy.simulate(self.start_time, self.final_time, simulate_options = simulate_options);
+
+    def test_error_simulate_method(self):
+        '''Test occupancy prediction with an unknown method.'''
+        plt.close('all');
+        # Load occupancy model
+        self._load_occupancy_model();
+        # Simulate with unknown method and expect error
+        simulate_options = self.occupancy.get_simulate_options();
+        simulate_options['method'] = 'unknown';
+        with self.assertRaises(ValueError):
+            self.occupancy.simulate(self.start_time, self.final_time, simulate_options = simulate_options);
+
     def test_error_points_per_day(self):
         '''Test occupancy prediction.'''
         plt.close('all');
@@ -753,8 +1095,7 @@ class OccupancyFromQueueing(TestCaseMPCPy):
         self.start_time = '3/1/2013';
         self.final_time = '3/7/2013 23:59';
         # Load occupancy model
-        with open(self.occupancy_model_file, 'r') as f:
-            self.occupancy = pickle.load(f);
+        self._load_occupancy_model();
         # Change occupant measurements to not be whole number in points per day
         self.occupancy.measurements['occupancy']['Sample'] = variables.Static('occupancy_sample', 299, units.s);
         # Estimate occupancy model parameters and expect error
@@ -762,5 +1103,387 @@ class OccupancyFromQueueing(TestCaseMPCPy):
             np.random.seed(1);
             self.occupancy.estimate(self.start_time, self.final_time);
 
+class OccupancyFromMarkov(TestCaseMPCPy):
+    '''Test the occupancy model using a Markov chain.
+
+    '''
+
+    def setUp(self):
+        # Setup building measurement collection from csv
+        self.csv_filepath = os.path.join(self.get_unittest_path(), 'resources', 'building', 'OccData.csv');
+        # Measurements
+        self.measurements = {};
+        self.measurements['occupancy'] = {'Sample' : variables.Static('occupancy_sample', 300, units.s)};
+        self.measurement_variable_map = {'Total People Count for the whole building (+)' : ('occupancy', units.unit1)};
+        # Instantiate building measurement source
+        self.building = systems.RealFromCSV(self.csv_filepath, \
+                                            self.measurements,
+                                            self.measurement_variable_map,
+                                            time_header = 'Date');
+        # Estimate occupancy model
+        self.building.collect_measurements('3/1/2013', '3/28/2013 23:59');
+        self.occupancy = models.Occupancy(models.MarkovModel, self.building.measurements);
+        estimate_options = self.occupancy.get_estimate_options();
+        estimate_options['max_occupancy'] = 20;
+        self.occupancy.estimate('3/1/2013', '3/14/2013 23:59', estimate_options = estimate_options);
+
+    def test_estimate(self):
+        '''Test the estimation method.'''
+        method = self.occupancy._occupancy_method;
+        for day in range(7):
+            # Check the transitions of the two training days
+            self.assertEqual(method.counts[day].shape, (287, 21, 21));
+            self.assertEqual(method.counts[day].sum(), 2*287);
+            np.testing.assert_allclose(method.transition[day].sum(axis = 2), 1);
+            np.testing.assert_allclose(np.sum(self.occupancy.parameters_data['p0'][day]['Value'].get_base_data()), 1);
+
+    def test_update(self):
+        '''Test the incremental update of the transition matrices.'''
+        self.occupancy.update('3/15/2013', '3/28/2013 23:59');
+        # Check the transitions are those estimated from all four weeks
+        occupancy = models.Occupancy(models.MarkovModel, self.building.measurements);
+        occupancy.estimate('3/1/2013', '3/28/2013 23:59', estimate_options = self.occupancy.get_estimate_options());
+        for day in range(7):
+            np.testing.assert_array_equal(self.occupancy._occupancy_method.counts[day], occupancy._occupancy_method.counts[day]);
+            np.testing.assert_allclose(self.occupancy._occupancy_method.transition[day], occupancy._occupancy_method.transition[day]);
+
+    def test_regular_timeseries(self):
+        '''Test estimation from a regular timeseries of occupancy.'''
+        ts = self.building.measurements['occupancy']['Measured'].display_data();
+        measurements = {'occupancy' : {'Sample' : self.building.measurements['occupancy']['Sample'], \
+                                       'Measured' : variables.RegularTimeseries('occupancy', ts, units.unit1)}};
+        occupancy = models.Occupancy(models.MarkovModel, measurements);
+        occupancy.estimate('3/1/2013', '3/14/2013 23:59', estimate_options = self.occupancy.get_estimate_options());
+        for day in range(7):
+            np.testing.assert_array_equal(occupancy._occupancy_method.counts[day], self.occupancy._occupancy_method.counts[day]);
+    def test_simulate(self):
+        '''Test occupancy prediction with both methods.'''
+        simulate_options = self.occupancy.get_simulate_options();
+        simulate_options['quantiles'] = [0.1, 0.9];
+        simulate_options['iter_num'] = 2000;
+        simulate_options['seed'] = 1;
+        prediction = {};
+        for method in ['analytic', 'monte_carlo']:
+            simulate_options['method'] = method;
+            self.occupancy.simulate('3/29/2013', '3/30/2013 23:59', simulate_options = simulate_options);
+            prediction[method] = self.occupancy.measurements['occupancy']['Simulated'].get_base_data();
+            q10 = self.occupancy.measurements['occupancy']['SimulatedQuantile10'].get_base_data();
+            q90 = self.occupancy.measurements['occupancy']['SimulatedQuantile90'].get_base_data();
+            # Check prediction values
+            self.assertEqual(len(prediction[method]), 2*288);
+            self.assertTrue(np.all(prediction[method] >= 0));
+            self.assertTrue(np.all(prediction[method] <= 20));
+            self.assertTrue(np.all(q10 <= q90));
+        # Check the Monte Carlo prediction approaches the analytic one
+        self.assertTrue(np.max(np.abs(prediction['analytic'] - prediction['monte_carlo'])) < 1);
+        # Check load and constraint generation
+        load = self.occupancy.get_load(100);
+        constraint = self.occupancy.get_constraint(20, 25);
+        np.testing.assert_allclose(load.values, 100*prediction['monte_carlo'].values);
+        self.assertTrue(set(constraint.values) <= set([20, 25]));
+
+class MarkovFunctions(TestCaseMPCPy):
+    '''Test the functions of the Markov chain occupancy package.
+
+    '''
+
+    def setUp(self):
+        # Two days of data of three points
+        self.data = np.array([[0, 1, 2], [1, 1, 0.9]]);
+
+    def test_transition_counts(self):
+        '''Test the counting of the transitions.'''
+        initial, counts = transition_counts(self.data, 3);
+        np.testing.assert_array_equal(initial, [1, 1, 0]);
+        expected = np.zeros((2, 3, 3));
+        expected[0, 0, 1] = 1;
+        expected[0, 1, 1] = 1;
+        expected[1, 1, 2] = 1;
+        expected[1, 1, 1] = 1;
+        np.testing.assert_array_equal(counts, expected);
+        # Check counts are clipped to the largest state
+        initial, counts = transition_counts(self.data, 2);
+        self.assertEqual(counts[1, 1, 1], 2);
+        with self.assertRaises(ValueError):
+            transition_counts(-self.data, 3);
+
+    def test_transition_matrices(self):
+        '''Test the estimation and propagation of the transition matrices.'''
+        p0, transition = transition_matrices(*transition_counts(self.data, 3));
+        np.testing.assert_allclose(p0, [0.5, 0.5, 0]);
+        # Check unobserved states stay in the same state
+        np.testing.assert_allclose(transition[0, 2], [0, 0, 1]);
+        np.testing.assert_allclose(transition[1, 1], [0, 0.5, 0.5]);
+        dist = propagate_distribution(p0, transition);
+        np.testing.assert_allclose(dist[2], [0, 0.5, 0.5]);
+        mean, std, quantile = distribution_statistics(dist, [0.25, 0.75]);
+        np.testing.assert_allclose(mean, [0.5, 1, 1.5]);
+        np.testing.assert_allclose(std, [0.5, 0, 0.5]);
+        np.testing.assert_array_equal(quantile, [[0, 1, 1], [1, 1, 2]]);
+
+    def test_simulate_markov_chain_batch(self):
+        '''Test the batched Monte Carlo simulation of the chain.'''
+        p0, transition = transition_matrices(*transition_counts(self.data, 3));
+        states = simulate_markov_chain_batch(p0, transition, 10000, random_stream(1, 0));
+        self.assertEqual(states.shape, (3, 10000));
+        # Check the empirical distribution approaches the propagated one
+        dist = empirical_distribution(states, 3);
+        np.testing.assert_allclose(dist, propagate_distribution(p0, transition), atol = 0.02);
+
+class QueueingFunctions(TestCaseMPCPy):
+    '''Test the functions of the queueing occupancy package.
+
+    '''
+
+    def setUp(self):
+        # Piecewise constant queue parameters over one day of 5 minute data
+        self.maxtime = 288;
+        self.lam = np.zeros((self.maxtime,));
+        self.lam[96:204] = 0.5;
+        self.mu = 0.05*np.ones((self.maxtime,));
+        self.empty_time = 240;
+
+    def test_simulate_queue_batch(self):
+        '''Test the batched Monte Carlo simulation of the queue.'''
+        np.random.seed(1);
+        syssize_mc = simulate_queue_batch(self.maxtime, self.lam, self.mu, 0, self.empty_time, 50);
+        # Check size and values
+        self.assertEqual(syssize_mc.shape, (self.maxtime, 50));
+        self.assertTrue(np.all(syssize_mc >= 0));
+        self.assertTrue(np.all(syssize_mc[:97,:] == 0));
+        self.assertTrue(np.all(syssize_mc[self.empty_time:,:] == 0));
+        self.assertTrue(np.all(np.mean(syssize_mc[150:204,:], axis=1) > 2));
+
+    def test_simulate_queue_batch_nstart(self):
+        '''Test the batched simulation with customers initially in the queue.'''
+        np.random.seed(1);
+        nstart = np.array([0, 5, 10]);
+        syssize_mc = simulate_queue_batch(self.maxtime, 0*self.lam, self.mu, nstart, self.empty_time, 3);
+        # Check initial customers and their departure
+        self.assertTrue(np.all(syssize_mc[0,:] <= nstart));
+        self.assertTrue(np.all(syssize_mc[0,:] >= 0.5*nstart));
+        self.assertTrue(np.all(np.diff(syssize_mc, axis=0) <= 0));
+        self.assertTrue(np.all(syssize_mc[self.empty_time:,:] == 0));
+
+    def test_occupancy_moments(self):
+        '''Test the analytic mean and variance of the queue system size.'''
+        mean, var = occupancy_moments(self.maxtime, self.lam, self.mu, 0, self.empty_time);
+        # Check against the Monte Carlo simulation
+        np.random.seed(1);
+        syssize_mc = simulate_queue_batch(self.maxtime, self.lam, self.mu, 0, self.empty_time, 2000);
+        self.assertTrue(np.allclose(mean, np.mean(syssize_mc, axis=1), rtol = 0.05, atol = 0.1));
+        self.assertTrue(np.allclose(var, np.var(syssize_mc, axis=1), rtol = 0.2, atol = 0.1));
+        # Check the system size is Poisson and empty after empty_time
+        np.testing.assert_array_equal(mean, var);
+        self.assertTrue(np.all(mean[self.empty_time:] == 0));
+        # Check the closed form without truncation at the end of the arrivals
+        mean, var = occupancy_moments(self.maxtime, self.lam, self.mu, 0, None);
+        self.assertAlmostEqual(mean[204], 0.5*np.exp(-0.05)*(1-np.exp(-0.05*108))/(1-np.exp(-0.05)), places = 6);
+
+    def test_rate_profiles(self):
+        '''Test the simulation and the moments of many rate profiles at once.'''
+        lam = np.vstack((self.lam, 0.5*self.lam, 0*self.lam));
+        mu = np.vstack((self.mu, 2*self.mu, self.mu));
+        mean, var = occupancy_moments(self.maxtime, lam, mu, 2, self.empty_time);
+        np.random.seed(1);
+        syssize_mc = simulate_queue_batch(self.maxtime, lam, mu, 2, self.empty_time, 2000);
+        self.assertEqual(syssize_mc.shape, (self.maxtime, 3*2000));
+        syssize_mc = syssize_mc.reshape((self.maxtime, 3, 2000));
+        for j in range(3):
+            # Check each profile is the same as on its own
+            mean_j, var_j = occupancy_moments(self.maxtime, lam[j], mu[j], 2, self.empty_time);
+            np.testing.assert_allclose(mean[j], mean_j, rtol = 1e-10, atol = 1e-12);
+            np.testing.assert_allclose(var[j], var_j, rtol = 1e-10, atol = 1e-12);
+            self.assertTrue(np.allclose(mean_j, np.mean(syssize_mc[:,j,:], axis=1), rtol = 0.05, atol = 0.1));
+
+    def test_unique_last(self):
+        '''Test the unique values and the indices of their last occurrences.'''
+        C, ia = unique_last(np.array([0., 2., 2., 3., 3., 3., 7.]));
+        np.testing.assert_array_equal(C, [0., 2., 3., 7.]);
+        np.testing.assert_array_equal(ia, [0, 2, 5, 6]);
+        # Check unsorted values
+        C, ia = unique_last(np.array([5., 1., 5., 1., 2.]));
+        np.testing.assert_array_equal(C, [1., 2., 5.]);
+        np.testing.assert_array_equal(ia, [2, 3, 4]);
+
+    def test_interp1(self):
+        '''Test the previous neighbour interpolation.'''
+        x = np.array([6., 0., 2., 3.]);
+        v = np.array([4., 1., 2., 3.]);
+        xq = np.array([-1., 0., 1., 2., 2.5, 3., 5., 6., 8., np.nan]);
+        vq = interp1(x, v, xq);
+        np.testing.assert_array_equal(vq[:-1], [1., 1., 1., 1., 2., 2., 3., 3., 4.]);
+        self.assertTrue(np.isnan(vq[-1]));
+
+    def test_simulate_queue_batch_random_state(self):
+        '''Test the batched simulation with random streams.'''
+        syssize_1 = simulate_queue_batch(self.maxtime, self.lam, self.mu, 0, self.empty_time, 20, random_state = random_stream(1, 0));
+        syssize_2 = simulate_queue_batch(self.maxtime, self.lam, self.mu, 0, self.empty_time, 20, random_state = random_stream(1, 0));
+        syssize_3 = simulate_queue_batch(self.maxtime, self.lam, self.mu, 0, self.empty_time, 20, random_state = random_stream(1, 1));
+        # Check the same stream gives the same simulation
+        np.testing.assert_array_equal(syssize_1, syssize_2);
+        self.assertFalse(np.array_equal(syssize_1, syssize_3));
+        # Check the global random state is not used
+        np.random.seed(1);
+        state = np.random.get_state()[1].copy();
+        simulate_queue_batch(self.maxtime, self.lam, self.mu, 0, self.empty_time, 20, random_state = random_stream(1, 0));
+        np.testing.assert_array_equal(np.random.get_state()[1], state);
+        # Check no seed and invalid keys
+        self.assertIsNone(random_stream(None, 0));
+        with self.assertRaises(ValueError):
+            random_stream(1, -1);
+
+    def test_running_statistics(self):
+        '''Test the streaming statistics of observations added in batches.'''
+        np.random.seed(1);
+        data = np.random.poisson(3, (10, 500));
+        moments = RunningMoments(10);
+        quantiles = CountQuantiles([0.1, 0.5, 0.9], 10);
+        for start in range(0, 500, 120):
+            moments.update(data[:,start:start+120]);
+            quantiles.update(data[:,start:start+120]);
+        # Check against the statistics of all observations
+        self.assertTrue(np.allclose(moments.mean, np.mean(data, axis=1)));
+        self.assertTrue(np.allclose(moments.std(), np.std(data, axis=1)));
+        data_sorted = np.sort(data, axis=1);
+        for i, q in enumerate([0.1, 0.5, 0.9]):
+            np.testing.assert_array_equal(quantiles.quantiles()[i], data_sorted[:,int(np.ceil(q*500))-1]);
+        # Check non integer observations
+        with self.assertRaises(ValueError):
+            quantiles.update(0.5*np.ones((10,1)));
+
+    def test_occupancy_quantiles(self):
+        '''Test the analytic quantiles of the queue system size.'''
+        quantile = occupancy_quantiles(self.maxtime, self.lam, self.mu, 0, self.empty_time, [0.1, 0.5, 0.9]);
+        # Check against the Monte Carlo simulation in chunks
+        np.random.seed(1);
+        mean, std, quantile_mc = simulate_queue_statistics(self.maxtime, self.lam, self.mu, 0, self.empty_time, 2000, [0.1, 0.5, 0.9], chunk_size = 300);
+        self.assertEqual(quantile.shape, (3, self.maxtime));
+        self.assertTrue(np.all(np.abs(quantile - quantile_mc) <= 1));
+        self.assertTrue(np.allclose(mean, occupancy_moments(self.maxtime, self.lam, self.mu, 0, self.empty_time)[0], rtol = 0.05, atol = 0.1));
+        # Check customers initially in the system
+        quantile = occupancy_quantiles(self.maxtime, 0*self.lam, self.mu, 10, self.empty_time, [0.5]);
+        self.assertEqual(quantile[0,0], 10);
+        self.assertTrue(np.all(np.diff(quantile[0]) <= 0));
+
+    def test_param_inference_from_counts(self):
+        '''Test the parameters inferred from cumulative counts.'''
+        np.random.seed(1);
+        data = simulate_queue_batch(self.maxtime, self.lam, self.mu, 0, self.empty_time, 5).T;
+        arr_cum, dep_cum, queue_cum = param_inference_cumulative_counts(data);
+        right = np.arange(97, 230, 7);
+        h = np.floor((96+right)/2.+0.5);
+        lam, mu = param_inference_from_counts(arr_cum, dep_cum, queue_cum, 96, right, h, self.empty_time);
+        # Check against the parameters inferred from each segment
+        self.assertEqual(lam.shape, (5, right.size));
+        for i in range(5):
+            for j in range(right.size):
+                lam_seg, mu_seg = param_inference(data[i,96:right[j]], h[j], self.empty_time);
+                self.assertEqual(lam[i,j], lam_seg);
+                self.assertEqual(mu[i,j], mu_seg);
+
+    def test_parameter_inference_given_segments(self):
+        '''Test the parameters inferred for all segments of all days.'''
+        np.random.seed(1);
+        data = simulate_queue_batch(self.maxtime, self.lam, self.mu, 0, self.empty_time, 5).T;
+        empty_time = np.where(np.mean(data, axis=0) != 0)[0][-1]+1;
+        seg_point = np.array([50, 96, 150, 204, empty_time]);
+        lam, mu = parameter_inference_given_segments(data, seg_point, empty_time);
+        self.assertEqual(lam.shape, (6, 5));
+        # Check against the parameters inferred from each segment of each day
+        segs = np.concatenate(([0], seg_point, [self.maxtime]));
+        for i in range(5):
+            lam_day, mu_day = parameter_inference_given_segment(data[i,:], seg_point, empty_time);
+            np.testing.assert_array_equal(lam_day, lam[:,i]);
+            np.testing.assert_array_equal(mu_day, mu[:,i]);
+            for j in range(6):
+                lam_seg, mu_seg = param_inference(data[i,segs[j]:segs[j+1]], segs[j+1], empty_time);
+                self.assertEqual(lam[j,i], lam_seg);
+                self.assertEqual(mu[j,i], mu_seg);
+        # Check the empty segment after the empty time
+        np.testing.assert_array_equal(lam[-1,:], 0);
+        np.testing.assert_array_equal(mu[-1,:], 100);
+        # Check negative occupancy and empty segments
+        with self.assertRaises(ValueError):
+            parameter_inference_given_segments(-data, seg_point, empty_time);
+        with self.assertRaises(ValueError):
+            parameter_inference_given_segments(data, np.array([50, 50]), empty_time);
+
+    def test_adaptive_breakpoint_placement(self):
+        '''Test the breakpoints placed with both scoring methods.'''
+        np.random.seed(1);
+        data = simulate_queue_batch(self.maxtime, self.lam, self.mu, 0, self.empty_time, 20).T;
+        for score_method in ['monte_carlo', 'analytic']:
+            seg_point = adaptive_breakpoint_placement(data, 3, 3, 6, score_method = score_method);
+            # Check the range of the breakpoints
+            self.assertTrue(len(seg_point) > 0);
+            self.assertTrue(all(0 < point < self.maxtime for point in seg_point));
+        # Check the analytic scoring finds the changes of the arrival rate
+        self.assertTrue(min(abs(np.array(seg_point)-96)) <= 6);
+        self.assertTrue(min(abs(np.array(seg_point)-204)) <= 6);
+        # Check the analytic scoring is deterministic
+        self.assertEqual(seg_point, adaptive_breakpoint_placement(data, 3, 3, 6, score_method = 'analytic'));
+        # Check unknown scoring method
+        with self.assertRaises(ValueError):
+            adaptive_breakpoint_placement(data, 3, 3, 6, score_method = 'other');
+
+    def test_optimal_breakpoint_placement(self):
+        '''Test the breakpoints placed by penalized likelihood segmentation.'''
+        np.random.seed(1);
+        data = simulate_queue_batch(self.maxtime, self.lam, self.mu, 0, self.empty_time, 20).T;
+        seg_point = optimal_breakpoint_placement(data, 3);
+        # Check the changes of the arrival rate and the empty time are found
+        empty_time = np.where(np.mean(data, axis=0) != 0)[0][-1]+1;
+        self.assertEqual(seg_point[-1], empty_time);
+        self.assertTrue(min(abs(np.array(seg_point)-96)) <= 3);
+        self.assertTrue(min(abs(np.array(seg_point)-204)) <= 3);
+        self.assertTrue(np.all(np.diff(seg_point) >= 3));
+        # Check the default penalty is the BIC of the two rates of a segment
+        self.assertEqual(seg_point, optimal_breakpoint_placement(data, 3, penalty = np.log(data.shape[0]*empty_time)));
+        # Check a large penalty only keeps the empty time
+        self.assertEqual(optimal_breakpoint_placement(data, 3, penalty = 1e6), [empty_time]);
+
+    def test_coarse_to_fine_breakpoint_placement(self):
+        '''Test the breakpoints placed on downsampled data and refined.'''
+        np.random.seed(1);
+        data = simulate_queue_batch(self.maxtime, self.lam, self.mu, 0, self.empty_time, 20).T;
+        # Check no downsampling places the breakpoints at full resolution
+        seg_point = coarse_to_fine_breakpoint_placement(data, 3, 3, 6, 1, score_method = 'analytic');
+        self.assertEqual(seg_point, adaptive_breakpoint_placement(data, 3, 3, 6, score_method = 'analytic'));
+        # Check the refined breakpoints
+        seg_point = coarse_to_fine_breakpoint_placement(data, 3, 3, 6, 4, score_method = 'analytic');
+        self.assertTrue(len(seg_point) > 0);
+        self.assertTrue(np.all(np.diff(seg_point) >= 3));
+        self.assertTrue(all(0 < point < self.maxtime for point in seg_point));
+        self.assertTrue(min(abs(np.array(seg_point)-96)) <= 6);
+        self.assertTrue(min(abs(np.array(seg_point)-204)) <= 6);
+        # Check the refinement selects the same first breakpoint as the full 
+        # resolution search among the same candidates
+        lam = np.zeros((self.maxtime,));
+        lam[64:166] = 0.29;
+        np.random.seed(730);
+        data = simulate_queue_batch(self.maxtime, lam, 0.108*np.ones((self.maxtime,)), 0, self.empty_time, 9).T;
+        arr_cum, dep_cum, queue_cum = param_inference_cumulative_counts(data);
+        empty_time = np.where(np.mean(data, axis=0) != 0)[0][-1]+1;
+        point = _refine_breakpoint(data, np.mean(data, axis=0), arr_cum, dep_cum, queue_cum, 0, self.maxtime, np.arange(3, self.maxtime-3), empty_time);
+        self.assertEqual([point], adaptive_breakpoint_placement(data, 1, 3, 2, score_method = 'analytic'));
+        # Check occupancy missed by the downsampling places the breakpoints 
+        # at full resolution
+        data = np.zeros((5, self.maxtime));
+        data[:,101:103] = 1;
+        seg_point = coarse_to_fine_breakpoint_placement(data, 3, 3, 6, 4, score_method = 'analytic');
+        self.assertEqual(seg_point, adaptive_breakpoint_placement(data, 3, 3, 6, score_method = 'analytic'));
+
+    def test_estimate_unoccupied_day(self):
+        '''Test the estimation of a day of the week that is never occupied.'''
+        data = np.zeros((4, self.maxtime));
+        estimate_options = models.QueueModel().estimate_options;
+        for function in [models._estimate_queue_day, models._estimate_queue_pelt_day]:
+            seg_point, empty_time, lam, mu = function((data, estimate_options, 0));
+            self.assertEqual(len(seg_point), 0);
+            self.assertEqual(empty_time, 0);
+            np.testing.assert_array_equal(lam, [0]);
+            np.testing.assert_array_equal(mu, [0]);
+
 if __name__ == '__main__':
     unittest.main()
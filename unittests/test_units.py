@@ -5,6 +5,8 @@ This module contains the classes for testing the units of mpcpy.
 """
 
 import unittest
+import numpy as np
+import pandas as pd
 from mpcpy import variables
 from mpcpy import units
         
@@ -1169,5 +1171,50 @@ class Boolean(unittest.TestCase):
         # Test the display unit name string
         self.assertEqual(self.var.get_display_unit_name(), 'boolean');            
         
+#%% Affine conversion tests
+class AffineConversion(unittest.TestCase):
+    def test_affine_coefficients(self):
+        # Test the coefficients agree with the conversion of each unit
+        for unit in units.affine_coefficients.keys():
+            var = variables.Static('var1', 0.0, unit);
+            scale, offset = units.affine_coefficients[unit];
+            for value in [0.0, 1.0, 72.0]:
+                np.testing.assert_allclose(scale*value + offset, var.display_unit._convert_to_base(value), rtol = 1e-9, atol = 1e-9);
+                np.testing.assert_allclose((value - offset)/scale, var.display_unit._convert_from_base(value), rtol = 1e-9, atol = 1e-9);
+    def test_convert(self):
+        # Test conversion between display units of scalars and arrays
+        self.assertAlmostEqual(units.convert(72.0, units.degF, units.degC), 22.222, places = 3);
+        data = np.array([0.0, 1.0, 2.5]);
+        np.testing.assert_allclose(units.convert(data, units.kWh, units.Btu), data*3.6e6/1055.05585);
+        # Test conversion of a DataFrame block
+        df = pd.DataFrame({'a' : [32.0, 212.0], 'b' : [50.0, 68.0]});
+        df_converted = units.convert(df, units.degF, units.degC);
+        np.testing.assert_allclose(df_converted.values, [[0, 10], [100, 20]], atol = 1e-9);
+        # Test conversion to the same unit
+        np.testing.assert_allclose(units.convert(data, units.degC, units.degC), data);
+    def test_convert_error(self):
+        # Test units of different quantities
+        with self.assertRaises(ValueError):
+            units.convert(1.0, units.degC, units.kW);
+        # Test units without affine conversion
+        with self.assertRaises(ValueError):
+            units.convert(1, units.boolean, units.boolean_integer);
+        
+#%% Unit registry tests
+class UnitRegistry(unittest.TestCase):
+    def test_get_unit_class(self):
+        # Test the unit string of every unit
+        for unit in units.affine_coefficients.keys() + [units.boolean, units.boolean_integer]:
+            var = variables.Static('var1', 1, unit);
+            self.assertIs(units.get_unit_class(var.get_display_unit_name()), unit);
+        # Test unknown unit string
+        self.assertEqual(units.get_unit_class('unknown'), []);
+    def test_get_quantity(self):
+        # Test the quantity of every unit
+        for unit in units.unit_quantities.keys():
+            var = variables.Static('var1', 1, unit);
+            self.assertEqual(units.get_quantity(unit), (var.quantity_name, var.get_base_unit()));
+        self.assertEqual(units.get_quantity(units.degF), ('Temperature', units.K));
+        
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
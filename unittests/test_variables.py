@@ -7,8 +7,11 @@ This module contains the classes for testing the variables of mpcpy.
 import unittest
 from mpcpy import variables
 from mpcpy import units
+from mpcpy import utility
 import numpy as np
 import pandas as pd
+import pickle
+import copy
 from dateutil.relativedelta import relativedelta
 
 
@@ -64,6 +67,36 @@ class Static(unittest.TestCase):
             self.assertEqual(self.var_array.display_data()[i], x);
             i = i + 1;
             
+    def test_set_data_array_conversion(self):
+        '''Test the conversion of all elements at once of lists and arrays.'''
+        x_list = [1,2,3,4.5];
+        expected = [variables.Static('var', float(x), units.degF).get_base_data() for x in x_list];
+        # Check lists keep float elements
+        var_list = variables.Static('var_list', x_list, units.degF);
+        self.assertIs(type(var_list.get_base_data()), list);
+        self.assertEqual(var_list.get_base_data(), expected);
+        self.assertTrue(all(type(x) is float for x in var_list.get_base_data()));
+        # Check integer arrays are converted as floats
+        var_array = variables.Static('var_array', np.array([1,2,3,4]), units.degF);
+        self.assertEqual(var_array.get_base_data().dtype, np.float64);
+        np.testing.assert_array_equal(var_array.get_base_data(), expected[:3] + [variables.Static('var', 4.0, units.degF).get_base_data()]);
+        # Check boolean units cast each element
+        var_bool = variables.Static('var_bool', np.array([True, False]), units.boolean);
+        np.testing.assert_array_equal(var_bool.get_base_data(), [1, 0]);
+            
+    def test_slots(self):
+        '''Test the compact representation of static variables.'''
+        self.assertFalse(hasattr(self.var, '__dict__'));
+        self.assertFalse(hasattr(self.var.display_unit, '__dict__'));
+        with self.assertRaises(AttributeError):
+            self.var.other = 1;
+        # Check pickling and copying keep the data and display unit
+        for var in [pickle.loads(pickle.dumps(self.var, 0)), pickle.loads(pickle.dumps(self.var, 2)), copy.deepcopy(self.var)]:
+            self.assertEqual(var.get_base_data(), self.var.get_base_data());
+            self.assertEqual(var.display_data(), self.var.display_data());
+            self.assertIs(var.get_display_unit(), self.var.get_display_unit());
+            self.assertEqual(var.quantity_name, self.var.quantity_name);
+            
     def test_set_data_string(self):
         '''Test setting data that is a string returns as TypeError.'''
         data = '25.0';
@@ -110,10 +143,34 @@ class Timeseries(unittest.TestCase):
         for i in range(len(self.dataF)):
             self.assertAlmostEqual(self.var.get_base_data().get_values()[i], np.array([295.372,295.928,296.483,297.039,297.594,298.150])[i], places = 3);
             self.assertAlmostEqual(self.var.display_data().get_values()[i], self.dataF[i], places = 3);
+    def test_set_data_integer(self):
+        '''Test setting integer data is converted as floats.'''
+        var = variables.Timeseries('var_int', pd.Series(data = [1, 2, 3], index = self.dataF_pd.index[:3]), units.degC);
+        self.assertEqual(var.get_base_data().dtype, np.float64);
+        np.testing.assert_allclose(var.get_base_data().values, [274.15, 275.15, 276.15]);
     def test_set_name(self):
         '''Test setting the name.'''
         self.var.name = 'var2';
         self.assertEqual(self.var.name, 'var2');
+    def test_display_data_cache(self):
+        '''Test the cache of the data in display units.'''
+        display = self.var.display_data();
+        self.assertIs(self.var.display_data(), display);
+        # Check the cache is kept for each display unit and time zone
+        self.var.set_display_unit(units.degF);
+        np.testing.assert_allclose(self.var.display_data().values, self.dataC*9.0/5+32);
+        self.var.set_display_unit(units.degC);
+        self.assertIs(self.var.display_data(), display);
+        display_local = self.var.display_data(tz_name = 'America/Los_Angeles');
+        self.assertEqual(display_local.index[0], self.time[0].tz_localize('UTC').tz_convert('America/Los_Angeles'));
+        self.assertIs(self.var.display_data(tz_name = 'America/Los_Angeles'), display_local);
+        self.assertIs(self.var.display_data(), display);
+        # Check setting data clears the cache
+        self.var.set_data(self.dataF_pd);
+        np.testing.assert_allclose(self.var.display_data().values, self.dataF);
+        # Check the cache can be turned off
+        self.var.cache_display = False;
+        self.assertIsNot(self.var.display_data(), self.var.display_data());
     def test_display_time_zone(self):
         '''Test that the default time zone is UTC.'''
         # Time zone by tz_name
@@ -200,5 +257,148 @@ class Cleaning(unittest.TestCase):
         self.assertAlmostEqual(self.var.get_base_data().get_values()[2], 0.22352, places = 3);
         self.assertAlmostEqual(self.var.display_data().get_values()[2], 0.5, places = 3);
 
+class RegularTimeseries(unittest.TestCase):
+    '''Tests for RegularTimeseries class.
+    
+    '''
+    
+    def setUp(self):
+        '''Instantiate regular timeseries variable.'''
+        self.dataC = np.array([20,21,22,23,24,25]);
+        self.time = pd.date_range('1/1/2016 00:00:00', '1/1/2016 05:00:00', freq = 'H');
+        self.dataC_pd = pd.Series(data = self.dataC, index = self.time);
+        self.var = variables.RegularTimeseries('var1', self.dataC, units.degC, start = '1/1/2016 00:00:00', step = '1H');
+    def test_instantiation(self):
+        '''Test instantiation from an array and from a series.'''
+        self.assertIsInstance(self.var, variables.Timeseries);
+        self.assertEqual(self.var.variability, 'Timeseries');
+        self.assertEqual(self.var.quantity_name, 'Temperature');
+        self.assertEqual(self.var.start, self.time[0].tz_localize('UTC'));
+        self.assertEqual(self.var.step, pd.Timedelta(hours = 1));
+        var = variables.RegularTimeseries('var1', self.dataC_pd, units.degC);
+        self.assertEqual(var.start, self.var.start);
+        self.assertEqual(var.step, self.var.step);
+        np.testing.assert_allclose(var.values, self.var.values);
+    def test_data(self):
+        '''Test the data is the same as for a timeseries variable.'''
+        ts = variables.Timeseries('var1', self.dataC_pd, units.degC);
+        self.assertIs(self.var._index, None);
+        self.assertTrue((self.var.get_base_data().index == ts.get_base_data().index).all());
+        np.testing.assert_allclose(self.var.get_base_data().values, ts.get_base_data().values);
+        np.testing.assert_allclose(self.var.display_data().values, self.dataC);
+        self.assertEqual(self.var.display_data(tz_name = 'America/Los_Angeles').index[0], self.time[0].tz_localize('UTC').tz_convert('America/Los_Angeles'));
+    def test_irregular(self):
+        '''Test a series without a constant step raises an error.'''
+        with self.assertRaises(ValueError):
+            variables.RegularTimeseries('var1', self.dataC_pd.drop(self.time[2]), units.degC);
+        with self.assertRaises(ValueError):
+            variables.RegularTimeseries('var1', self.dataC, units.degC);
+    def test_daylight_saving_time(self):
+        '''Test a local series across a daylight saving time change is regular in UTC.'''
+        time = pd.DatetimeIndex(['3/10/2013 00:00:00', '3/10/2013 01:00:00', '3/10/2013 03:00:00', '3/10/2013 04:00:00']);
+        data = pd.Series(data = self.dataC[:4], index = time);
+        ts = variables.Timeseries('var1', data, units.degC, tz_name = 'America/Los_Angeles');
+        var = variables.RegularTimeseries('var1', data, units.degC, tz_name = 'America/Los_Angeles');
+        self.assertEqual(var.step, pd.Timedelta(hours = 1));
+        self.assertTrue((var.get_base_data().index == ts.get_base_data().index).all());
+        np.testing.assert_allclose(var.display_data().values, self.dataC[:4]);
+    def test_set_base_data(self):
+        '''Test setting the data in base units.'''
+        self.var.get_base_data();
+        self.var.data = self.var.get_base_data()[1:] + 1;
+        self.assertEqual(self.var.start, self.time[1].tz_localize('UTC'));
+        self.assertEqual(self.var.step, pd.Timedelta(hours = 1));
+        np.testing.assert_allclose(self.var.display_data().values, self.dataC[1:]+1);
+        with self.assertRaises(ValueError):
+            self.var.data = self.var.get_base_data().drop(self.var.get_base_data().index[2]);
+    def test_window(self):
+        '''Test windows by time.'''
+        window = self.var.window('1/1/2016 00:30:00', '1/1/2016 03:00:00');
+        self.assertEqual(window.start, self.time[1].tz_localize('UTC'));
+        np.testing.assert_allclose(window.display_data().values, self.dataC[1:4]);
+        self.assertTrue(np.may_share_memory(window.values, self.var.values));
+        np.testing.assert_allclose(window.display_data().values, self.dataC_pd.loc['1/1/2016 00:30:00':'1/1/2016 03:00:00'].values);
+        self.assertEqual(len(self.var.window('1/1/2016 06:00:00', '1/1/2016 08:00:00').values), 0);
+        self.assertEqual(len(self.var.window('12/31/2015 00:00:00', '1/2/2016 00:00:00').values), 6);
+    def test_simtime(self):
+        '''Test simulation times.'''
+        np.testing.assert_allclose(self.var.get_simtime(), 3600.0*np.arange(6));
+        np.testing.assert_allclose(self.var.get_simtime('1/1/2016 01:00:00'), 3600.0*np.arange(-1,5));
+        
+class TimeseriesBlock(unittest.TestCase):
+    '''Tests for TimeseriesBlock class.
+    
+    '''
+    
+    def setUp(self):
+        '''Create block of timeseries variables.'''
+        self.time = pd.date_range('1/1/2016 00:00:00', '1/1/2016 05:00:00', freq = 'H');
+        self.df = pd.DataFrame({'Tin' : np.array([20,21,22,23,24,25]),
+                                'Tout' : np.array([72,73,74,75,76,77]),
+                                'Pow' : np.array([1,2,3,4,5,6])}, index = self.time);
+        self.block = variables.TimeseriesBlock(self.df, {'Tin' : units.degC, 'Tout' : units.degF, 'Pow' : units.kW});
+    def test_instantiation(self):
+        '''Test the block contains a timeseries view of each column.'''
+        self.assertEqual(self.block.keys(), ['Pow', 'Tin', 'Tout']);
+        self.assertEqual(len(self.block), 3);
+        self.assertTrue('Tin' in self.block);
+        var = self.block['Tin'];
+        self.assertIsInstance(var, variables.Timeseries);
+        self.assertEqual(var.name, 'Tin');
+        self.assertEqual(var.quantity_name, 'Temperature');
+        self.assertIs(var.get_display_unit(), units.degC);
+        self.assertIs(var.block, self.block);
+        self.assertEqual([view.name for view in self.block.values()], ['Pow', 'Tin', 'Tout']);
+        self.assertEqual(self.block.items()[1], ('Tin', var));
+        self.assertEqual(var.get_base_data().index[0], self.time[0].tz_localize('UTC'));
+    def test_data(self):
+        '''Test the data of the views in base and display units.'''
+        np.testing.assert_allclose(self.block['Tin'].get_base_data().values, self.df['Tin']+273.15);
+        np.testing.assert_allclose(self.block['Tout'].get_base_data().values, (self.df['Tout']-32)*5.0/9+273.15);
+        np.testing.assert_allclose(self.block['Pow'].get_base_data().values, self.df['Pow']*1000.0);
+        np.testing.assert_allclose(self.block.display_data().values, self.df[['Pow', 'Tin', 'Tout']].values);
+        self.assertEqual(self.block.get_display_unit('Pow'), units.kW);
+    def test_shared_data(self):
+        '''Test the views share the data of the block.'''
+        base = self.block.get_base_data(['Tin', 'Pow']);
+        self.assertEqual(list(base.columns), ['Tin', 'Pow']);
+        np.testing.assert_allclose(base['Tin'].values, self.block['Tin'].get_base_data().values);
+        self.assertTrue(np.may_share_memory(self.block['Tin'].get_base_data().values, self.block.array));
+    def test_set_data(self):
+        '''Test setting the data of a view detaches it from the block.'''
+        var = self.block['Tin'];
+        var.set_data(self.df['Tin']+1);
+        self.assertIs(var.block, None);
+        np.testing.assert_allclose(var.display_data().values, self.df['Tin']+1);
+        np.testing.assert_allclose(self.block.display_data()['Tin'].values, self.df['Tin']);
+        np.testing.assert_allclose(self.block.get_base_data(['Tin'])['Tin'].values, self.df['Tin']+273.15);
+    def test_to_dataframe(self):
+        '''Test combining views of a block gives the same dataframe as combining separate timeseries.'''
+        pandas_utility = utility._mpcpyPandas();
+        ts_list = [variables.Timeseries('Tout', self.df['Tout'], units.degF), variables.Timeseries('Tin', self.df['Tin'], units.degC)];
+        df = pandas_utility._mpcpy_ts_list_to_dataframe(ts_list);
+        df_block = pandas_utility._mpcpy_ts_list_to_dataframe([self.block['Tout'], self.block['Tin']]);
+        self.assertEqual(list(df_block.columns), list(df.columns));
+        self.assertEqual(df_block.index.name, 'Time');
+        np.testing.assert_allclose(df_block.values, df.values);
+    def test_set_display_unit(self):
+        '''Test the block uses the display unit set on a view.'''
+        self.block['Tin'].set_display_unit(units.K);
+        self.assertEqual(self.block.get_display_unit('Tin'), units.K);
+        np.testing.assert_allclose(self.block.display_data()['Tin'].values, self.df['Tin']+273.15);
+        np.testing.assert_allclose(self.block.display_data()['Tout'].values, self.df['Tout']);
+    def test_to_dataframe_renamed(self):
+        '''Test combining renamed views of a block.'''
+        pandas_utility = utility._mpcpyPandas();
+        self.block['Tin'].name = 'Tzone';
+        df_block = pandas_utility._mpcpy_ts_list_to_dataframe([self.block['Tout'], self.block['Tin']]);
+        self.assertEqual(list(df_block.columns), ['Tout', 'Tzone']);
+        np.testing.assert_allclose(df_block['Tzone'].values, self.df['Tin']+273.15);
+        np.testing.assert_allclose(df_block['Tout'].values, (self.df['Tout']-32)*5.0/9+273.15);
+    def test_display_time_zone(self):
+        '''Test the display data of the block in a time zone.'''
+        display = self.block.display_data(tz_name = 'America/Los_Angeles');
+        self.assertEqual(display.index[0], self.time[0].tz_localize('UTC').tz_convert('America/Los_Angeles'));
+
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file